@@ -3,6 +3,8 @@ Admin API module - refactored from single file into modular structure
 """
 from fastapi import APIRouter
 
+from app.api.responses import ORJSONResponse
+
 # Import all sub-routers
 from app.api.admin import auth
 from app.api.admin import stats
@@ -18,8 +20,8 @@ from app.api.admin import prompts
 # Export auth functions for use in other modules
 from app.api.admin.auth import verify_admin_token, validate_telegram_webapp_data
 
-# Create main router
-router = APIRouter()
+# Create main router; every admin route renders with orjson unless it picks its own class
+router = APIRouter(default_response_class=ORJSONResponse)
 
 # Include all sub-routers
 router.include_router(auth.router, tags=["auth"])
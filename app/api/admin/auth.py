@@ -3,9 +3,8 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Dict, Any
 import logging
 import hmac
-import hashlib
 from urllib.parse import parse_qsl
-import json
+import orjson
 
 from app.config import config
 
@@ -13,11 +12,23 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 security = HTTPBearer()
 
+_ADMIN_TOKEN = config.ADMIN_TOKEN.encode()
+
 def verify_admin_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    if credentials.credentials != config.ADMIN_TOKEN:
+    if not hmac.compare_digest(credentials.credentials.encode(), _ADMIN_TOKEN):
         raise HTTPException(status_code=401, detail="Invalid admin token")
     return True
 
+# WebApp secret key depends only on the bot token: token -> HMAC("WebAppData", token)
+_SECRET_KEY_CACHE: Dict[str, bytes] = {}
+
+def _get_secret_key(bot_token: str) -> bytes:
+    key = _SECRET_KEY_CACHE.get(bot_token)
+    if key is None:
+        key = hmac.digest(b"WebAppData", bot_token.encode(), 'sha256')
+        _SECRET_KEY_CACHE[bot_token] = key
+    return key
+
 def validate_telegram_webapp_data(init_data: str, bot_token: str) -> Dict[str, Any]:
     """Validate Telegram WebApp initData and return parsed user data"""
     try:
@@ -25,40 +36,23 @@ def validate_telegram_webapp_data(init_data: str, bot_token: str) -> Dict[str, A
         parsed_data = dict(parse_qsl(init_data))
 
         # Extract hash
-        data_check_string_parts = []
-        hash_value = None
-
-        for key, value in sorted(parsed_data.items()):
-            if key == 'hash':
-                hash_value = value
-            else:
-                data_check_string_parts.append(f"{key}={value}")
-
+        hash_value = parsed_data.pop('hash', None)
         if not hash_value:
             raise ValueError("No hash in initData")
 
-        data_check_string = '\n'.join(data_check_string_parts)
+        data_check_string = '\n'.join(f"{key}={parsed_data[key]}" for key in sorted(parsed_data))
 
-        # Create secret key
-        secret_key = hmac.new(
-            key=b"WebAppData",
-            msg=bot_token.encode(),
-            digestmod=hashlib.sha256
-        ).digest()
+        secret_key = _get_secret_key(bot_token)
 
         # Calculate hash
-        calculated_hash = hmac.new(
-            key=secret_key,
-            msg=data_check_string.encode(),
-            digestmod=hashlib.sha256
-        ).hexdigest()
-
-        # Verify hash
-        if calculated_hash != hash_value:
+        calculated_mac = hmac.digest(secret_key, data_check_string.encode(), 'sha256')
+
+        # Verify hash (bytes.fromhex raises ValueError on malformed input)
+        if not hmac.compare_digest(calculated_mac, bytes.fromhex(hash_value)):
             raise ValueError("Invalid hash")
 
         # Parse user data
-        user_data = json.loads(parsed_data.get('user', '{}'))
+        user_data = orjson.loads(parsed_data.get('user', '{}'))
 
         return user_data
     except Exception as e:
@@ -83,7 +77,7 @@ async def verify_admin_access(request: Request):
             raise HTTPException(status_code=401, detail="No user ID in data")
 
         # Check if user is admin
-        if user_id not in config.ADMIN_IDS:
+        if user_id not in config.ADMIN_IDS_SET:
             logger.warning(f"Access denied for user {user_id}")
             raise HTTPException(status_code=403, detail="Access denied")
 
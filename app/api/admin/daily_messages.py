@@ -3,6 +3,7 @@ from typing import Optional
 import logging
 
 from app.database.connection import db
+from app.database.models import DailyMessageModel
 from app.api.admin.auth import verify_admin_token
 from app.api.admin.models import DailyMessageCreate, DailyMessageUpdate
 
@@ -68,6 +69,7 @@ async def create_daily_message(
             message.is_active,
             message.weight
         )
+        DailyMessageModel.invalidate_active_ids()
 
         return {
             "status": "success",
@@ -130,6 +132,7 @@ async def update_daily_message(
         """
 
         row = await db.fetchrow(query, *params)
+        DailyMessageModel.invalidate_active_ids()
 
         return {
             "status": "success",
@@ -166,6 +169,7 @@ async def delete_daily_message(
             "DELETE FROM daily_messages WHERE id = $1",
             message_id
         )
+        DailyMessageModel.invalidate_active_ids()
 
         return {
             "status": "success",
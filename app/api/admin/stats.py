@@ -1,239 +1,319 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
-from datetime import datetime, date
+from fastapi.responses import StreamingResponse
+from datetime import datetime, date, timedelta
 from typing import Optional
+import asyncio
 import logging
+import time
 
 from app.database.connection import db
 from app.api.admin.auth import verify_admin_token
+from app.api.responses import ORJSONResponse, orjson_dumps
+from app.utils.cache import TTLCache
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+DAILY_METRICS_QUERY = """
+    SELECT d AS date, dau, new_users, active_users, blocked_total,
+           daily_sent, paid_active, paid_new, questions, revenue
+    FROM fact_daily_metrics
+    WHERE d BETWEEN $1 AND $2
+    ORDER BY d
+"""
+
+DAILY_TOTALS_QUERY = """
+    SELECT COUNT(*) AS total_days,
+           COALESCE(SUM(dau), 0) AS total_dau,
+           COALESCE(SUM(new_users), 0) AS total_new_users,
+           COALESCE(SUM(questions), 0) AS total_questions,
+           COALESCE(SUM(revenue), 0)::float8 AS total_revenue,
+           COALESCE(AVG(dau), 0)::float8 AS avg_dau
+    FROM fact_daily_metrics
+    WHERE d BETWEEN $1 AND $2
+"""
+
+# Polled by the dashboard - keep their plans warm on every pool connection
+db.register_statement('daily_metrics', DAILY_METRICS_QUERY)
+db.register_statement('daily_totals', DAILY_TOTALS_QUERY)
+
+# Daily metrics are recalculated once a day, so range responses are cached
+_stats_cache = TTLCache(maxsize=128)
+HISTORICAL_CACHE_TTL = 30 * 24 * 3600
+CURRENT_CACHE_TTL = 3600
+
+# Exports are only kept for the cache up to this size; larger ones just stream through
+EXPORT_CACHE_MAX_BYTES = 1024 * 1024
+# COPY chunks buffered ahead of a slow client before Postgres output is paused
+EXPORT_QUEUE_SIZE = 16
+
+def _cache_ttl(end_date: date) -> float:
+    """Ranges that reach today expire by midnight at the latest, older ones are final"""
+    now = datetime.now()
+    if end_date < now.date():
+        return HISTORICAL_CACHE_TTL
+
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return min(CURRENT_CACHE_TTL, (midnight - now).total_seconds())
+
 @router.get("/admin/stats")
 async def get_stats(
-    date_from: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
-    date_to: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
+    date_from: Optional[date] = Query(None, description="Start date (YYYY-MM-DD)"),
+    date_to: Optional[date] = Query(None, description="End date (YYYY-MM-DD)"),
     _: bool = Depends(verify_admin_token)
 ):
     try:
-        if not date_from:
-            date_from = date.today().strftime('%Y-%m-%d')
-        if not date_to:
-            date_to = date.today().strftime('%Y-%m-%d')
-
-        start_date = datetime.strptime(date_from, '%Y-%m-%d').date()
-        end_date = datetime.strptime(date_to, '%Y-%m-%d').date()
-
-        rows = await db.fetch(
-            """
-            SELECT * FROM fact_daily_metrics
-            WHERE d BETWEEN $1 AND $2
-            ORDER BY d
-            """,
-            start_date, end_date
+        start_date = date_from or date.today()
+        end_date = date_to or date.today()
+
+        cache_key = ('stats', start_date, end_date)
+        cached = _stats_cache.get(cache_key)
+        if cached is not None:
+            return ORJSONResponse(cached)
+
+        # Rows and the summary aggregate run concurrently on two pool connections
+        rows, totals = await asyncio.gather(
+            db.fetch_prepared('daily_metrics', start_date, end_date),
+            db.fetchrow_prepared('daily_totals', start_date, end_date)
         )
 
-        stats = []
-        for row in rows:
-            stats.append({
-                'date': row['d'].isoformat(),
-                'dau': row['dau'],
-                'new_users': row['new_users'],
-                'active_users': row['active_users'],
-                'blocked_total': row['blocked_total'],
-                'daily_sent': row['daily_sent'],
-                'paid_active': row['paid_active'],
-                'paid_new': row['paid_new'],
-                'questions': row['questions'],
-                'revenue': float(row['revenue'])
-            })
-
-        # Calculate summary
+        stats = [dict(row) for row in rows]
+
         summary = {
-            'total_days': len(stats),
-            'total_dau': sum(s['dau'] for s in stats),
-            'total_new_users': sum(s['new_users'] for s in stats),
-            'total_questions': sum(s['questions'] for s in stats),
-            'total_revenue': sum(s['revenue'] for s in stats),
-            'avg_dau': sum(s['dau'] for s in stats) / len(stats) if stats else 0
+            'total_days': totals['total_days'],
+            'total_dau': totals['total_dau'],
+            'total_new_users': totals['total_new_users'],
+            'total_questions': totals['total_questions'],
+            'total_revenue': totals['total_revenue'],
+            'avg_dau': totals['avg_dau']
         }
 
-        return {
+        result = {
             'stats': stats,
             'summary': summary,
             'period': {
-                'from': date_from,
-                'to': date_to
+                'from': start_date,
+                'to': end_date
             }
         }
 
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+        _stats_cache.set(cache_key, result, _cache_ttl(end_date))
+        return ORJSONResponse(result)
+
     except Exception as e:
         logger.error(f"Error getting admin stats: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+async def _stream_csv(cache_key, cached: Optional[bytes], date_from: date, date_to: date):
+    """Yield COPY ... TO STDOUT output chunk by chunk as Postgres produces it"""
+    if cached is not None:
+        yield cached
+        return
+
+    # COPY pushes chunks into the queue from its own task and waits while it is full;
+    # None marks the end
+    queue: asyncio.Queue = asyncio.Queue(maxsize=EXPORT_QUEUE_SIZE)
+
+    async def copy_rows():
+        try:
+            async with db.pool.acquire() as conn:
+                # Let Postgres encode the CSV; NULL cells are exported as 0
+                await conn.copy_from_query(
+                    DAILY_METRICS_QUERY,
+                    date_from, date_to,
+                    output=queue.put,
+                    format='csv',
+                    header=True,
+                    null='0'
+                )
+        finally:
+            # When cancelled the download has gone away and nobody waits for the marker
+            if not asyncio.current_task().cancelling():
+                await queue.put(None)
+
+    copy_task = asyncio.create_task(copy_rows())
+    try:
+        chunks = []
+        size = 0
+        while (chunk := await queue.get()) is not None:
+            if chunks is not None:
+                size += len(chunk)
+                if size <= EXPORT_CACHE_MAX_BYTES:
+                    chunks.append(chunk)
+                else:
+                    chunks = None
+            yield chunk
+
+        # Surface COPY errors instead of ending the download silently
+        await copy_task
+        if chunks is not None:
+            _stats_cache.set(cache_key, b''.join(chunks), _cache_ttl(date_to))
+    except Exception as e:
+        logger.error(f"Error streaming CSV export: {e}")
+        raise
+    finally:
+        copy_task.cancel()
+
 @router.get("/admin/export")
 async def export_stats(
-    date_from: str = Query(..., description="Start date (YYYY-MM-DD)"),
-    date_to: str = Query(..., description="End date (YYYY-MM-DD)"),
+    date_from: date = Query(..., description="Start date (YYYY-MM-DD)"),
+    date_to: date = Query(..., description="End date (YYYY-MM-DD)"),
     format: str = Query("json", description="Export format: json, csv"),
     _: bool = Depends(verify_admin_token)
 ):
     try:
-        start_date = datetime.strptime(date_from, '%Y-%m-%d').date()
-        end_date = datetime.strptime(date_to, '%Y-%m-%d').date()
-
-        rows = await db.fetch(
-            """
-            SELECT * FROM fact_daily_metrics
-            WHERE d BETWEEN $1 AND $2
-            ORDER BY d
-            """,
-            start_date, end_date
-        )
+        cache_key = ('export', date_from, date_to, format)
+        cached = _stats_cache.get(cache_key)
 
         if format == "csv":
-            from fastapi.responses import Response
-
-            headers = ['date', 'dau', 'new_users', 'active_users', 'blocked_total',
-                      'daily_sent', 'paid_active', 'paid_new', 'questions', 'revenue']
-
-            csv_lines = [','.join(headers)]
-
-            for row in rows:
-                line = ','.join([str(row[header] if row[header] is not None else 0) for header in headers])
-                csv_lines.append(line)
-
-            csv_content = '\n'.join(csv_lines)
-
-            return Response(
-                content=csv_content,
+            return StreamingResponse(
+                _stream_csv(cache_key, cached, date_from, date_to),
                 media_type="text/csv",
                 headers={"Content-Disposition": f"attachment; filename=stats_{date_from}_{date_to}.csv"}
             )
 
-        # JSON format (default)
-        stats = []
-        for row in rows:
-            stats.append({
-                'date': row['d'].isoformat(),
-                'dau': row['dau'],
-                'new_users': row['new_users'],
-                'active_users': row['active_users'],
-                'blocked_total': row['blocked_total'],
-                'daily_sent': row['daily_sent'],
-                'paid_active': row['paid_active'],
-                'paid_new': row['paid_new'],
-                'questions': row['questions'],
-                'revenue': float(row['revenue'])
-            })
+        # JSON format (default) - rows are streamed as they come off the cursor
+        async def generate_json():
+            yield b'{"data":['
+
+            if cached is not None:
+                yield cached
+            else:
+                chunks = []
+                size = 0
+                first = True
+                async with db.pool.acquire() as conn:
+                    stmt = await db.statement(conn, 'daily_metrics')
+                    async with conn.transaction():
+                        async for row in stmt.cursor(date_from, date_to):
+                            chunk = orjson_dumps(dict(row))
+                            if not first:
+                                chunk = b',' + chunk
+                            first = False
+                            if chunks is not None:
+                                size += len(chunk)
+                                if size <= EXPORT_CACHE_MAX_BYTES:
+                                    chunks.append(chunk)
+                                else:
+                                    chunks = None
+                            yield chunk
+
+                if chunks is not None:
+                    _stats_cache.set(cache_key, b''.join(chunks), _cache_ttl(date_to))
+
+            yield b'],"period":' + orjson_dumps({'from': date_from, 'to': date_to})
+            yield b',"exported_at":' + orjson_dumps(datetime.now()) + b'}'
+
+        return StreamingResponse(generate_json(), media_type="application/json")
 
-        return {
-            'data': stats,
-            'period': {'from': date_from, 'to': date_to},
-            'exported_at': datetime.now().isoformat()
-        }
-
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
     except Exception as e:
         logger.error(f"Error exporting stats: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+# Planner estimate of the users table size; exact COUNT(*) only until the table is first analyzed
+TOTAL_USERS_QUERY = """
+    SELECT CASE WHEN reltuples > 0 THEN reltuples::bigint
+                ELSE (SELECT COUNT(*) FROM users) END
+    FROM pg_class
+    WHERE oid = 'users'::regclass
+"""
+
+# Dashboard counters by response key, run as columns of one prepared statement
+DASHBOARD_COUNTERS = {
+    'total_users': TOTAL_USERS_QUERY,
+
+    # Active users (last seen today/week)
+    'active_today': "SELECT COUNT(*) FROM users WHERE DATE(last_seen_at) = CURRENT_DATE",
+    'active_week': "SELECT COUNT(*) FROM users WHERE last_seen_at > now() - interval '7 days'",
+
+    # New users
+    'new_today': "SELECT COUNT(*) FROM users WHERE DATE(first_seen_at) = CURRENT_DATE",
+    'new_week': "SELECT COUNT(*) FROM users WHERE first_seen_at > now() - interval '7 days'",
+    'new_month': "SELECT COUNT(*) FROM users WHERE first_seen_at > now() - interval '30 days'",
+
+    # Subscriptions
+    'active_subscriptions': "SELECT COUNT(*) FROM subscriptions WHERE status = 'active' AND ends_at > now()",
+
+    # Revenue
+    'today_revenue': "SELECT COALESCE(SUM(amount), 0)::float8 FROM subscriptions WHERE DATE(started_at) = CURRENT_DATE",
+    'month_revenue': "SELECT COALESCE(SUM(amount), 0)::float8 FROM subscriptions WHERE started_at > now() - interval '30 days'",
+
+    # Payments today
+    'payments_today': "SELECT COUNT(*) FROM subscriptions WHERE DATE(started_at) = CURRENT_DATE"
+}
+
+# One round trip on one connection, so a dashboard refresh never takes a pool slot per counter
+db.register_statement('dashboard_counters', "SELECT " + ",\n       ".join(
+    f"({query.strip()}) AS {name}" for name, query in DASHBOARD_COUNTERS.items()
+))
+
+db.register_statement('dashboard_subs_by_plan', """
+    SELECT plan_code, COUNT(*) as count
+    FROM subscriptions
+    WHERE status = 'active' AND ends_at > now()
+    GROUP BY plan_code
+""")
+
+# The dashboard is polled; repeated polls within this window share one result
+DASHBOARD_CACHE_TTL = 30
+
 @router.get("/admin/dashboard")
 async def get_dashboard(_: bool = Depends(verify_admin_token)):
     """Get dashboard summary with extended metrics"""
     try:
-        # Total users
-        total_users = await db.fetchval("SELECT COUNT(*) FROM users")
+        cached = _stats_cache.get(('dashboard',))
+        if cached is not None:
+            return ORJSONResponse(cached)
 
-        # Active users (last seen today/week)
-        active_today = await db.fetchval(
-            "SELECT COUNT(*) FROM users WHERE DATE(last_seen_at) = CURRENT_DATE"
-        )
-        active_week = await db.fetchval(
-            "SELECT COUNT(*) FROM users WHERE last_seen_at > now() - interval '7 days'"
+        counters, subs_by_plan = await asyncio.gather(
+            db.fetchrow_prepared('dashboard_counters'),
+            db.fetch_prepared('dashboard_subs_by_plan')
         )
 
-        # New users
-        new_today = await db.fetchval(
-            "SELECT COUNT(*) FROM users WHERE DATE(first_seen_at) = CURRENT_DATE"
-        )
-        new_week = await db.fetchval(
-            "SELECT COUNT(*) FROM users WHERE first_seen_at > now() - interval '7 days'"
-        )
-        new_month = await db.fetchval(
-            "SELECT COUNT(*) FROM users WHERE first_seen_at > now() - interval '30 days'"
-        )
-
-        # Subscriptions
-        active_subs = await db.fetchval(
-            "SELECT COUNT(*) FROM subscriptions WHERE status = 'active' AND ends_at > now()"
-        )
-
-        # Subscriptions by plan
-        subs_by_plan = await db.fetch(
-            """
-            SELECT plan_code, COUNT(*) as count
-            FROM subscriptions
-            WHERE status = 'active' AND ends_at > now()
-            GROUP BY plan_code
-            """
-        )
-
-        # Revenue
-        today_revenue = await db.fetchval(
-            "SELECT COALESCE(SUM(amount), 0) FROM subscriptions WHERE DATE(started_at) = CURRENT_DATE"
-        )
-        month_revenue = await db.fetchval(
-            "SELECT COALESCE(SUM(amount), 0) FROM subscriptions WHERE started_at > now() - interval '30 days'"
-        )
+        result = dict(counters)
+        result['subscriptions_by_plan'] = {row['plan_code']: row['count'] for row in subs_by_plan}
+        result['timestamp'] = datetime.now().isoformat()
 
-        # Payments today
-        payments_today = await db.fetchval(
-            "SELECT COUNT(*) FROM subscriptions WHERE DATE(started_at) = CURRENT_DATE"
-        )
-
-        return {
-            'total_users': total_users,
-            'active_today': active_today,
-            'active_week': active_week,
-            'new_today': new_today,
-            'new_week': new_week,
-            'new_month': new_month,
-            'active_subscriptions': active_subs,
-            'subscriptions_by_plan': {row['plan_code']: row['count'] for row in subs_by_plan},
-            'today_revenue': float(today_revenue) if today_revenue else 0,
-            'month_revenue': float(month_revenue) if month_revenue else 0,
-            'payments_today': payments_today,
-            'timestamp': datetime.now().isoformat()
-        }
+        _stats_cache.set(('dashboard',), result, DASHBOARD_CACHE_TTL)
+        return ORJSONResponse(result)
 
     except Exception as e:
         logger.error(f"Error getting dashboard: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+def _read_git_commit() -> str:
+    try:
+        with open('/app/GIT_COMMIT', 'r') as f:
+            return f.read().strip()
+    except Exception:
+        return "unknown"
+
+# Written into the image at build time, so it never changes while the process runs
+GIT_COMMIT = _read_git_commit()
+
+# Probes within this window reuse the last successful database check
+HEALTH_CHECK_QUERY = "SELECT 1"
+HEALTH_CHECK_INTERVAL = 30
+_health_checked_at = 0.0
+
 @router.get("/health")
 async def health_check():
+    global _health_checked_at
     try:
-        # Simple database check
-        await db.fetchval("SELECT 1")
-
-        # Get git commit hash
-        try:
-            with open('/app/GIT_COMMIT', 'r') as f:
-                git_hash = f.read().strip()
-        except Exception:
-            git_hash = "unknown"
+        # Simple database check, skipped while the last one is still fresh
+        now = time.monotonic()
+        if db.pool is None or db.pool.is_closing() or now - _health_checked_at >= HEALTH_CHECK_INTERVAL:
+            await db.fetchval(HEALTH_CHECK_QUERY)
+            _health_checked_at = now
 
         return {
             "status": "healthy",
             "service": "Bot Oracle",
             "version": "2.0.0",
-            "commit": git_hash,
+            "commit": GIT_COMMIT,
             "timestamp": datetime.now().isoformat()
         }
     except Exception as e:
+        _health_checked_at = 0.0
         logger.error(f"Health check failed: {e}")
         raise HTTPException(status_code=503, detail="Service unhealthy")
\ No newline at end of file
@@ -2,8 +2,9 @@ from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import Optional
 import logging
 
-from app.database.connection import db
+from app.database.connection import db, FETCH_BATCH_SIZE
 from app.api.admin.auth import verify_admin_token
+from app.api.responses import ORJSONResponse
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -17,7 +18,9 @@ async def get_subscriptions(
     """Get subscriptions list"""
     try:
         query = """
-            SELECT s.*, u.tg_user_id, u.username
+            SELECT s.id, s.user_id, u.tg_user_id, u.username, s.plan_code,
+                   COALESCE(s.amount, 0)::float8 AS amount, s.currency, s.status,
+                   s.started_at, s.ends_at
             FROM subscriptions s
             JOIN users u ON u.id = s.user_id
             WHERE 1=1
@@ -32,28 +35,13 @@ async def get_subscriptions(
         query += " ORDER BY s.started_at DESC LIMIT $1"
         params.append(limit)
 
-        rows = await db.fetch(query, *params)
-
-        subscriptions = []
-        for row in rows:
-            subscriptions.append({
-                'id': row['id'],
-                'user_id': row['user_id'],
-                'tg_user_id': row['tg_user_id'],
-                'username': row['username'],
-                'plan_code': row['plan_code'],
-                'amount': float(row['amount']) if row['amount'] else 0,
-                'currency': row['currency'],
-                'status': row['status'],
-                'started_at': row['started_at'].isoformat() if row['started_at'] else None,
-                'ends_at': row['ends_at'].isoformat() if row['ends_at'] else None
-            })
-
-        return {
+        subscriptions = await db.fetch_dicts(query, *params, batched=limit > FETCH_BATCH_SIZE)
+
+        return ORJSONResponse({
             'subscriptions': subscriptions,
             'total': len(subscriptions),
             'filter': status
-        }
+        })
 
     except Exception as e:
         logger.error(f"Error getting subscriptions: {e}")
@@ -1,25 +1,60 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from uuid import uuid4
+import asyncio
+import hashlib
 import logging
 
-from app.database.connection import db
+from app.database.connection import db, FETCH_BATCH_SIZE
 from app.api.admin.auth import verify_admin_token
+from app.api.responses import ORJSONResponse
 from app.scheduler import get_scheduler
+from app.utils.cache import TTLCache
 from app.config import config
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Manually triggered scheduler jobs: job_id -> (trigger name, task)
+_jobs: Dict[str, Tuple[str, asyncio.Task]] = {}
+MAX_TRACKED_JOBS = 100
+
+def _log_job_result(name: str, task: asyncio.Task):
+    if not task.cancelled() and task.exception():
+        logger.error(f"Triggered job {name} failed: {task.exception()}")
+
+def _start_job(name: str, coro_factory: Callable[[], Awaitable[Any]], message: str):
+    """Run a scheduler job in the background and answer 202 with its job id"""
+    for job_name, task in _jobs.values():
+        if job_name == name and not task.done():
+            raise HTTPException(status_code=409, detail=f"{name} is already running")
+
+    # Forget the oldest finished jobs once the registry is full
+    if len(_jobs) >= MAX_TRACKED_JOBS:
+        for job_id in [job_id for job_id, (_, task) in _jobs.items() if task.done()][:len(_jobs) - MAX_TRACKED_JOBS + 1]:
+            del _jobs[job_id]
+
+    task = asyncio.create_task(coro_factory())
+    task.add_done_callback(lambda t: _log_job_result(name, t))
+    job_id = uuid4().hex
+    _jobs[job_id] = (name, task)
+
+    return ORJSONResponse(
+        status_code=202,
+        content={"status": "accepted", "job_id": job_id, "message": message}
+    )
+
 @router.post("/admin/trigger/daily-messages")
 async def trigger_daily_messages(_: bool = Depends(verify_admin_token)):
     try:
         scheduler = get_scheduler()
         if scheduler:
-            await scheduler.trigger_daily_messages()
-            return {"status": "success", "message": "Daily messages triggered successfully"}
+            return _start_job("daily-messages", scheduler.trigger_daily_messages, "Daily messages triggered successfully")
         else:
             return {"status": "error", "message": "Scheduler not available"}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error triggering daily messages: {e}")
         raise HTTPException(status_code=500, detail="Failed to trigger daily messages")
@@ -30,14 +65,11 @@ async def trigger_crm_planning(_: bool = Depends(verify_admin_token)):
     try:
         scheduler = get_scheduler()
         if scheduler:
-            stats = await scheduler.trigger_crm_planning()
-            return {
-                "status": "success",
-                "message": "CRM planning triggered successfully",
-                "stats": stats
-            }
+            return _start_job("crm-planning", scheduler.trigger_crm_planning, "CRM planning triggered successfully")
         else:
             return {"status": "error", "message": "Scheduler not available"}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error triggering CRM planning: {e}")
         raise HTTPException(status_code=500, detail="Failed to trigger CRM planning")
@@ -48,18 +80,84 @@ async def trigger_crm_dispatch(_: bool = Depends(verify_admin_token)):
     try:
         scheduler = get_scheduler()
         if scheduler:
-            stats = await scheduler.trigger_crm_dispatch()
-            return {
-                "status": "success",
-                "message": "CRM dispatch triggered successfully",
-                "stats": stats
-            }
+            return _start_job("crm-dispatch", scheduler.trigger_crm_dispatch, "CRM dispatch triggered successfully")
         else:
             return {"status": "error", "message": "Scheduler not available"}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error triggering CRM dispatch: {e}")
         raise HTTPException(status_code=500, detail="Failed to trigger CRM dispatch")
 
+@router.post("/admin/trigger/crm-cycle")
+async def trigger_crm_cycle(_: bool = Depends(verify_admin_token)):
+    """Manually trigger CRM planning followed by dispatch in one call"""
+    try:
+        scheduler = get_scheduler()
+        if scheduler:
+            async def run_cycle():
+                # Dispatch sends the tasks planning has just created, so keep them in order
+                planning = await scheduler.trigger_crm_planning()
+                dispatch = await scheduler.trigger_crm_dispatch()
+                return {"planning": planning, "dispatch": dispatch}
+
+            return _start_job("crm-cycle", run_cycle, "CRM cycle triggered successfully")
+        else:
+            return {"status": "error", "message": "Scheduler not available"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error triggering CRM cycle: {e}")
+        raise HTTPException(status_code=500, detail="Failed to trigger CRM cycle")
+
+@router.get("/admin/trigger/status/{job_id}")
+async def get_trigger_status(job_id: str, _: bool = Depends(verify_admin_token)):
+    """Get state and result of a manually triggered job"""
+    job = _jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    name, task = job
+    result = {"job_id": job_id, "trigger": name, "done": task.done()}
+
+    if not task.done():
+        result["status"] = "running"
+    elif task.cancelled():
+        result["status"] = "cancelled"
+    elif task.exception():
+        result["status"] = "error"
+        result["error"] = str(task.exception())
+    else:
+        result["status"] = "success"
+        result["stats"] = task.result()
+
+    return result
+
+def _crm_tasks_query(by_user: bool, by_status: bool) -> str:
+    conditions = []
+    if by_user:
+        conditions.append(f"t.user_id = ${len(conditions) + 1}")
+    if by_status:
+        conditions.append(f"t.status = ${len(conditions) + 1}")
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return f"""
+        SELECT t.id, t.user_id, u.tg_user_id, u.username, t.type, t.status,
+               t.due_at, t.sent_at, t.created_at, t.payload
+        FROM admin_tasks t
+        JOIN users u ON u.id = t.user_id
+        {where}
+        ORDER BY t.created_at DESC
+        LIMIT ${len(conditions) + 1}
+    """
+
+# One fixed SQL string per (user_id, status) filter combination
+_CRM_QUERIES = {
+    (by_user, by_status): _crm_tasks_query(by_user, by_status)
+    for by_user in (False, True)
+    for by_status in (False, True)
+}
+
 @router.get("/admin/crm/tasks")
 async def get_crm_tasks(
     user_id: Optional[int] = Query(None, description="Filter by user ID"),
@@ -69,92 +167,112 @@ async def get_crm_tasks(
 ):
     """Get CRM tasks"""
     try:
-        query = """
-            SELECT t.*, u.tg_user_id, u.username, u.age, u.gender
-            FROM admin_tasks t
-            JOIN users u ON u.id = t.user_id
-            WHERE 1=1
-        """
-        params = []
-        param_count = 0
-
-        if user_id:
-            param_count += 1
-            query += f" AND t.user_id = ${param_count}"
-            params.append(user_id)
-
-        if status:
-            param_count += 1
-            query += f" AND t.status = ${param_count}"
-            params.append(status)
-
-        param_count += 1
-        query += f" ORDER BY t.created_at DESC LIMIT ${param_count}"
+        query = _CRM_QUERIES[(bool(user_id), bool(status))]
+        params = [value for value in (user_id, status) if value]
         params.append(limit)
 
-        rows = await db.fetch(query, *params)
-
-        tasks = []
-        for row in rows:
-            tasks.append({
-                'id': row['id'],
-                'user_id': row['user_id'],
-                'tg_user_id': row['tg_user_id'],
-                'username': row['username'],
-                'type': row['type'],
-                'status': row['status'],
-                'due_at': row['due_at'].isoformat() if row['due_at'] else None,
-                'sent_at': row['sent_at'].isoformat() if row['sent_at'] else None,
-                'created_at': row['created_at'].isoformat() if row['created_at'] else None,
-                'payload': row['payload']
-            })
+        tasks = await db.fetch_dicts(query, *params, batched=limit > FETCH_BATCH_SIZE)
 
-        return {
+        return ORJSONResponse({
             'tasks': tasks,
             'total': len(tasks),
             'filters': {'user_id': user_id, 'status': status}
-        }
+        })
 
     except Exception as e:
         logger.error(f"Error getting CRM tasks: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+# Repeated test prompts with the same parameters reuse the earlier model answer for an hour;
+# fallback stubs are never cached since they say nothing about the prompts under test
+_ai_test_cache = TTLCache(maxsize=256)
+AI_TEST_CACHE_TTL = 3600
+
+PERSONA_LABELS = {
+    "admin": "Administrator (эмоциональный помощник)",
+    "oracle": "Oracle (мудрый наставник)"
+}
+
 @router.post("/admin/test/ai-responses")
 async def test_ai_responses(
     question: str = Query(..., description="Test question"),
-    persona: str = Query("admin", description="Persona to test: admin or oracle"),
+    persona: str = Query("admin", description="Persona to test: admin, oracle or both"),
     age: int = Query(25, description="User age for personalization"),
     gender: str = Query("other", description="User gender: male, female, other"),
     _: bool = Depends(verify_admin_token)
 ):
     """Test AI responses for both personas"""
     try:
-        from app.services.ai_client import call_admin_ai, call_oracle_ai
+        from app.services.ai_client import call_admin_ai, call_oracle_ai, call_both_ai
+
+        cache_key = (persona, age, gender, hashlib.blake2b(question.encode(), digest_size=16).digest())
+        cached = _ai_test_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
         user_context = {'age': age, 'gender': gender}
 
+        if persona == "both":
+            # Both personas are generated concurrently for side-by-side comparison
+            admin_response, oracle_response = await call_both_ai(question, user_context, fallback=False)
+            result = {
+                "status": "success",
+                "persona": "both",
+                "question": question,
+                "responses": {
+                    "admin": {
+                        "persona": PERSONA_LABELS["admin"],
+                        "response": admin_response,
+                        "response_length": len(admin_response)
+                    },
+                    "oracle": {
+                        "persona": PERSONA_LABELS["oracle"],
+                        "response": oracle_response,
+                        "response_length": len(oracle_response)
+                    }
+                },
+                "user_context": user_context
+            }
+            _ai_test_cache.set(cache_key, result, AI_TEST_CACHE_TTL)
+            return result
+
         if persona == "admin":
-            response = await call_admin_ai(question, user_context)
-            response_type = "Administrator (эмоциональный помощник)"
+            response = await call_admin_ai(question, user_context, fallback=False)
         elif persona == "oracle":
-            response = await call_oracle_ai(question, user_context)
-            response_type = "Oracle (мудрый наставник)"
+            response = await call_oracle_ai(question, user_context, fallback=False)
         else:
-            raise HTTPException(status_code=400, detail="Invalid persona. Use 'admin' or 'oracle'")
+            raise HTTPException(status_code=400, detail="Invalid persona. Use 'admin', 'oracle' or 'both'")
 
-        return {
+        result = {
             "status": "success",
-            "persona": response_type,
+            "persona": PERSONA_LABELS[persona],
             "question": question,
             "response": response,
             "user_context": user_context,
             "response_length": len(response)
         }
+        _ai_test_cache.set(cache_key, result, AI_TEST_CACHE_TTL)
+        return result
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error testing AI responses: {e}")
         raise HTTPException(status_code=500, detail="Failed to test AI responses")
 
+# All task types created by the CRM test endpoint
+TEST_CRM_TASK_TYPES = [
+    'PING',
+    'NUDGE_SUB',
+    'DAILY_MSG_PROMPT',
+    'DAILY_MSG_PUSH',
+    'LIMIT_INFO',
+    'RECOVERY',
+    'POST_SUB_ONBOARD'
+]
+
+_FIRST_ADMIN = next(iter(config.ADMIN_IDS), None)
+
 @router.post("/admin/test/crm")
 async def test_crm_for_admin(
     tg_user_id: Optional[int] = Query(None, description="Telegram user ID to test (defaults to first admin)"),
@@ -163,7 +281,7 @@ async def test_crm_for_admin(
     """Test CRM system - creates all task types for specified user"""
     try:
         # Get admin user ID: use provided or default to first from config
-        admin_id = tg_user_id if tg_user_id else (config.ADMIN_IDS[0] if config.ADMIN_IDS else None)
+        admin_id = tg_user_id if tg_user_id else _FIRST_ADMIN
         if not admin_id:
             return {
                 "status": "error",
@@ -192,38 +310,27 @@ async def test_crm_for_admin(
         now_utc = datetime.utcnow()
         due_at = now_utc + timedelta(minutes=1)
 
-        # All task types to create
-        task_types = [
-            'PING',
-            'NUDGE_SUB',
-            'DAILY_MSG_PROMPT',
-            'DAILY_MSG_PUSH',
-            'LIMIT_INFO',
-            'RECOVERY',
-            'POST_SUB_ONBOARD'
-        ]
-
-        # Create all task types
-        created_tasks = []
-        for task_type in task_types:
-            row = await db.fetchrow(
-                """
-                INSERT INTO admin_tasks (user_id, type, status, due_at, created_at, updated_at, payload)
-                VALUES ($1, $2, 'scheduled', $3, $4, $4, '{}')
-                RETURNING id, type, status, due_at, created_at
-                """,
-                user_id,
-                task_type,
-                due_at,
-                now_utc
-            )
-            created_tasks.append({
-                "id": row['id'],
-                "type": row['type'],
-                "status": row['status'],
-                "due_at": row['due_at'].isoformat() + 'Z',
-                "created_at": row['created_at'].isoformat() + 'Z'
-            })
+        # Create all task types with one multi-row INSERT
+        rows = await db.fetch(
+            """
+            INSERT INTO admin_tasks (user_id, type, status, due_at, created_at, updated_at, payload)
+            SELECT $1, task_type, 'scheduled', $3, $4, $4, '{}'
+            FROM unnest($2::text[]) WITH ORDINALITY AS t(task_type, n)
+            ORDER BY n
+            RETURNING id, type, status, due_at, created_at
+            """,
+            user_id,
+            TEST_CRM_TASK_TYPES,
+            due_at,
+            now_utc
+        )
+        created_tasks = [{
+            "id": row['id'],
+            "type": row['type'],
+            "status": row['status'],
+            "due_at": row['due_at'].isoformat() + 'Z',
+            "created_at": row['created_at'].isoformat() + 'Z'
+        } for row in rows]
 
         logger.info(f"Created {len(created_tasks)} test tasks for admin {admin_id}")
 
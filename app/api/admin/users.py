@@ -1,13 +1,65 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import Response
 from typing import Optional
 import logging
 
-from app.database.connection import db
+from app.database.connection import db, FETCH_BATCH_SIZE
+from app.database.models import UserModel, SubscriptionModel
 from app.api.admin.auth import verify_admin_token
+from app.api.responses import ORJSONResponse
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Latest active subscription of a user, probed through idx_subscriptions_user_active
+ACTIVE_SUBSCRIPTION_LATERAL = """
+    LATERAL (
+        SELECT ends_at FROM subscriptions
+        WHERE user_id = u.id AND status = 'active' AND ends_at > now()
+        ORDER BY ends_at DESC
+        LIMIT 1
+    ) s ON true
+"""
+
+USER_LIST_COLUMNS = """
+    u.id, u.tg_user_id, u.username, u.first_seen_at, u.last_seen_at,
+    u.is_blocked, u.free_questions_left,
+    s.ends_at IS NOT NULL as has_subscription,
+    s.ends_at as subscription_end,
+    u.admin_thread_id, u.oracle_thread_id
+"""
+
+def _users_page_query(where: str) -> str:
+    """Pick the page of users first, then look up subscriptions for those rows only"""
+    return f"""
+        WITH page AS (
+            SELECT id, tg_user_id, username, first_seen_at, last_seen_at,
+                   is_blocked, free_questions_left, admin_thread_id, oracle_thread_id
+            FROM users
+            {where}
+            ORDER BY last_seen_at DESC
+            LIMIT $1
+        )
+        SELECT {USER_LIST_COLUMNS}
+        FROM page u
+        LEFT JOIN {ACTIVE_SUBSCRIPTION_LATERAL}
+        ORDER BY u.last_seen_at DESC
+    """
+
+# One fixed SQL string per status filter; paid users are found through the join itself
+_USERS_QUERIES = {
+    None: _users_page_query(""),
+    "blocked": _users_page_query("WHERE is_blocked = true"),
+    "active": _users_page_query("WHERE is_blocked = false"),
+    "paid": f"""
+        SELECT {USER_LIST_COLUMNS}
+        FROM users u
+        JOIN {ACTIVE_SUBSCRIPTION_LATERAL}
+        ORDER BY u.last_seen_at DESC
+        LIMIT $1
+    """
+}
+
 @router.get("/admin/users")
 async def get_users(
     status: Optional[str] = Query(None, description="Filter by status: active, blocked, paid"),
@@ -15,47 +67,80 @@ async def get_users(
     _: bool = Depends(verify_admin_token)
 ):
     try:
-        query = "SELECT u.*, s.ends_at as subscription_end FROM users u LEFT JOIN subscriptions s ON u.id = s.user_id AND s.status = 'active' AND s.ends_at > now()"
-        params = []
-
-        if status == "blocked":
-            query += " WHERE u.is_blocked = true"
-        elif status == "paid":
-            query += " WHERE s.id IS NOT NULL"
-        elif status == "active":
-            query += " WHERE u.is_blocked = false"
+        query = _USERS_QUERIES.get(status, _USERS_QUERIES[None])
 
-        query += " ORDER BY u.last_seen_at DESC LIMIT $1"
-        params.append(limit)
-
-        rows = await db.fetch(query, *params)
-
-        users = []
-        for row in rows:
-            users.append({
-                'id': row['id'],
-                'tg_user_id': row['tg_user_id'],
-                'username': row['username'],
-                'first_seen_at': row['first_seen_at'].isoformat() if row['first_seen_at'] else None,
-                'last_seen_at': row['last_seen_at'].isoformat() if row['last_seen_at'] else None,
-                'is_blocked': row['is_blocked'],
-                'free_questions_left': row['free_questions_left'],
-                'has_subscription': row['subscription_end'] is not None,
-                'subscription_end': row['subscription_end'].isoformat() if row['subscription_end'] else None,
-                'admin_thread_id': row.get('admin_thread_id'),
-                'oracle_thread_id': row.get('oracle_thread_id')
-            })
+        users = await db.fetch_dicts(query, limit, batched=limit > FETCH_BATCH_SIZE)
 
-        return {
+        return ORJSONResponse({
             'users': users,
             'total': len(users),
             'filter': status
-        }
+        })
 
     except Exception as e:
         logger.error(f"Error getting users: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+USER_DETAILS_SQL = f"""
+    SELECT u.id, u.tg_user_id, u.username, u.age, u.gender,
+           u.first_seen_at, u.last_seen_at, u.is_blocked, u.free_questions_left,
+           s.ends_at IS NOT NULL as has_subscription,
+           s.ends_at as subscription_end,
+           u.admin_thread_id, u.oracle_thread_id
+    FROM users u
+    LEFT JOIN {ACTIVE_SUBSCRIPTION_LATERAL}
+    WHERE u.id = $1
+"""
+
+# User history sections, aliased to the response keys
+USER_DAILY_MESSAGES_SQL = """
+    SELECT sent_date AS date
+    FROM daily_sent
+    WHERE user_id = $1
+    ORDER BY sent_date DESC
+    LIMIT 50
+"""
+
+USER_ORACLE_QUESTIONS_SQL = """
+    SELECT question, answer, source, asked_date AS date, asked_at, tokens_used AS tokens
+    FROM oracle_questions
+    WHERE user_id = $1
+    ORDER BY asked_at DESC
+    LIMIT 50
+"""
+
+USER_PAYMENTS_SQL = """
+    SELECT plan_code AS plan, amount::float8 AS amount, status, created_at, paid_at
+    FROM payments
+    WHERE user_id = $1
+    ORDER BY created_at DESC
+    LIMIT 50
+"""
+
+USER_CRM_LOGS_SQL = """
+    SELECT type, status, due_at, sent_at, result_code, created_at
+    FROM admin_tasks
+    WHERE user_id = $1
+    ORDER BY created_at DESC
+    LIMIT 100
+"""
+
+def _json_list(query: str) -> str:
+    # json_agg reads rows in the order of the sorted, limited subquery
+    return f"COALESCE((SELECT json_agg(h) FROM ({query}) h), '[]'::json)"
+
+# User details with all history sections as one JSON document in one round trip
+USER_DETAILS_JSON_SQL = f"""
+    SELECT json_build_object(
+        'user', row_to_json(u),
+        'daily_messages', {_json_list(USER_DAILY_MESSAGES_SQL)},
+        'oracle_questions', {_json_list(USER_ORACLE_QUESTIONS_SQL)},
+        'payments', {_json_list(USER_PAYMENTS_SQL)},
+        'crm_logs', {_json_list(USER_CRM_LOGS_SQL)}
+    )
+    FROM ({USER_DETAILS_SQL}) u
+"""
+
 @router.get("/admin/users/{user_id}")
 async def get_user_details(
     user_id: int,
@@ -63,113 +148,13 @@ async def get_user_details(
 ):
     """Get detailed user information including history"""
     try:
-        # Get user info
-        user = await db.fetchrow(
-            """
-            SELECT u.*,
-                   s.ends_at as subscription_end
-            FROM users u
-            LEFT JOIN subscriptions s ON s.user_id = u.id
-                AND s.status = 'active' AND s.ends_at > now()
-            WHERE u.id = $1
-            """,
-            user_id
-        )
+        # Postgres assembles the whole response; no row means no such user
+        content = await db.fetchval(USER_DETAILS_JSON_SQL, user_id)
 
-        if not user:
+        if content is None:
             raise HTTPException(status_code=404, detail="User not found")
 
-        # Get daily messages history
-        daily_messages = await db.fetch(
-            """
-            SELECT sent_date
-            FROM daily_sent
-            WHERE user_id = $1
-            ORDER BY sent_date DESC
-            LIMIT 50
-            """,
-            user_id
-        )
-
-        # Get Oracle questions history
-        oracle_questions = await db.fetch(
-            """
-            SELECT question, answer, source, asked_date, asked_at, tokens_used
-            FROM oracle_questions
-            WHERE user_id = $1
-            ORDER BY asked_at DESC
-            LIMIT 50
-            """,
-            user_id
-        )
-
-        # Get payments history
-        payments = await db.fetch(
-            """
-            SELECT plan_code, amount, status, created_at, paid_at
-            FROM payments
-            WHERE user_id = $1
-            ORDER BY created_at DESC
-            LIMIT 50
-            """,
-            user_id
-        )
-
-        # Get CRM tasks history (logs)
-        crm_logs = await db.fetch(
-            """
-            SELECT type, status, due_at, sent_at, result_code, payload, created_at
-            FROM admin_tasks
-            WHERE user_id = $1
-            ORDER BY created_at DESC
-            LIMIT 100
-            """,
-            user_id
-        )
-
-        return {
-            'user': {
-                'id': user['id'],
-                'tg_user_id': user['tg_user_id'],
-                'username': user['username'],
-                'age': user['age'],
-                'gender': user['gender'],
-                'first_seen_at': user['first_seen_at'].isoformat() if user['first_seen_at'] else None,
-                'last_seen_at': user['last_seen_at'].isoformat() if user['last_seen_at'] else None,
-                'is_blocked': user['is_blocked'],
-                'free_questions_left': user['free_questions_left'],
-                'has_subscription': user['subscription_end'] is not None,
-                'subscription_end': user['subscription_end'].isoformat() if user['subscription_end'] else None,
-                'admin_thread_id': user.get('admin_thread_id'),
-                'oracle_thread_id': user.get('oracle_thread_id')
-            },
-            'daily_messages': [{
-                'date': msg['sent_date'].isoformat()
-            } for msg in daily_messages],
-            'oracle_questions': [{
-                'question': q['question'],
-                'answer': q['answer'],
-                'source': q['source'],
-                'date': q['asked_date'].isoformat(),
-                'asked_at': q['asked_at'].isoformat() if q['asked_at'] else None,
-                'tokens': q['tokens_used']
-            } for q in oracle_questions],
-            'payments': [{
-                'plan': p['plan_code'],
-                'amount': float(p['amount']),
-                'status': p['status'],
-                'created_at': p['created_at'].isoformat() if p['created_at'] else None,
-                'paid_at': p['paid_at'].isoformat() if p['paid_at'] else None
-            } for p in payments],
-            'crm_logs': [{
-                'type': log['type'],
-                'status': log['status'],
-                'due_at': log['due_at'].isoformat() if log['due_at'] else None,
-                'sent_at': log['sent_at'].isoformat() if log['sent_at'] else None,
-                'result_code': log['result_code'],
-                'created_at': log['created_at'].isoformat() if log['created_at'] else None
-            } for log in crm_logs]
-        }
+        return Response(content=content, media_type="application/json")
 
     except HTTPException:
         raise
@@ -185,13 +170,12 @@ async def get_ai_sessions(
     try:
         # Get users with active threads
         rows = await db.fetch(
-            """
+            f"""
             SELECT u.id, u.tg_user_id, u.username, u.age, u.gender,
                    u.admin_thread_id, u.oracle_thread_id, u.last_seen_at,
                    s.ends_at as subscription_end
             FROM users u
-            LEFT JOIN subscriptions s ON s.user_id = u.id
-                AND s.status = 'active' AND s.ends_at > now()
+            LEFT JOIN {ACTIVE_SUBSCRIPTION_LATERAL}
             WHERE u.admin_thread_id IS NOT NULL OR u.oracle_thread_id IS NOT NULL
             ORDER BY u.last_seen_at DESC
             LIMIT 100
@@ -206,7 +190,7 @@ async def get_ai_sessions(
                 'username': row['username'],
                 'age': row['age'],
                 'gender': row['gender'],
-                'last_seen_at': row['last_seen_at'].isoformat() if row['last_seen_at'] else None,
+                'last_seen_at': row['last_seen_at'],
                 'has_subscription': row['subscription_end'] is not None,
                 'threads': []
             }
@@ -225,10 +209,10 @@ async def get_ai_sessions(
 
             sessions.append(session_info)
 
-        return {
+        return ORJSONResponse({
             'sessions': sessions,
             'total': len(sessions)
-        }
+        })
 
     except Exception as e:
         logger.error(f"Error getting AI sessions: {e}")
@@ -258,6 +242,8 @@ async def delete_user(
 
         # Finally delete the user
         await db.execute("DELETE FROM users WHERE id = $1", user_id)
+        UserModel.invalidate(tg_user_id=user['tg_user_id'], user_id=user_id)
+        SubscriptionModel.invalidate(user_id)
 
         logger.info(f"User {user_id} (tg_user_id: {user['tg_user_id']}) deleted by admin")
 
@@ -305,6 +291,7 @@ async def add_premium_day(
                 """,
                 existing_sub['id']
             )
+            SubscriptionModel.invalidate(user_id)
 
             new_end = await db.fetchval(
                 "SELECT ends_at FROM subscriptions WHERE id = $1",
@@ -330,6 +317,7 @@ async def add_premium_day(
                 0.0,
                 "RUB"
             )
+            SubscriptionModel.invalidate(user_id)
 
             new_sub = await db.fetchrow(
                 """
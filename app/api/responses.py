@@ -0,0 +1,31 @@
+"""
+Response classes shared by the API routers
+"""
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+def _orjson_default(value: Any) -> Any:
+    # asyncpg returns NUMERIC columns (amount, revenue) as Decimal unless the query casts to float8
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def orjson_dumps(content: Any) -> bytes:
+    """Serialize API content to JSON bytes"""
+    return orjson.dumps(
+        content,
+        default=_orjson_default,
+        option=orjson.OPT_NON_STR_KEYS
+    )
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered by orjson - datetime/date are serialized natively"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson_dumps(content)
@@ -3,7 +3,7 @@ from typing import Dict, Any
 import logging
 from aiogram import Bot
 
-from app.database.models import UserModel, SubscriptionModel, EventModel, PaymentModel
+from app.database.models import UserModel, PaymentModel
 from app.utils.robokassa import verify_signature_result, parse_robokassa_callback
 from app.config import config
 from app.services.persona import persona_factory
@@ -14,18 +14,16 @@ router = APIRouter()
 @router.api_route("/robokassa/result", methods=["GET", "POST"])
 async def robokassa_result(request: Request):
     try:
-        # Parse form data or query params
+        # Read form data or query params without copying every field -
+        # only the signed keys are needed until the signature checks out
         if request.method == "POST":
-            form = await request.form()
-            form_data = dict(form)
+            params = await request.form()
         else:
             # GET request - parse query params
-            form_data = dict(request.query_params)
-
-        logger.info(f"Robokassa callback received ({request.method}): {form_data}")
+            params = request.query_params
 
         # Parse callback data
-        callback_data = parse_robokassa_callback(form_data)
+        callback_data = parse_robokassa_callback(params)
 
         amount = callback_data['amount']
         inv_id = callback_data['inv_id']
@@ -40,6 +38,9 @@ async def robokassa_result(request: Request):
             logger.warning(f"Invalid signature for payment {inv_id}")
             raise HTTPException(status_code=400, detail="Invalid signature")
 
+        form_data = dict(params)
+        logger.info(f"Robokassa callback received ({request.method}): {form_data}")
+
         # Get payment info from database using numeric inv_id
         try:
             inv_id_int = int(inv_id)
@@ -426,38 +427,16 @@ async def robokassa_fail(request: Request):
 async def process_successful_payment(user_id: int, inv_id: int, plan_code: str,
                                    amount: float, raw_payload: Dict[str, Any]):
     try:
-        # Check if payment already processed
-        payment = await PaymentModel.get_payment_by_inv_id(inv_id)
-        if payment and payment['status'] == 'success':
+        # Mark the payment, log it and extend or start the subscription atomically
+        result = await PaymentModel.apply_successful_payment(inv_id, plan_code, amount, raw_payload)
+        if not result:
             logger.info(f"Payment {inv_id} already processed, skipping")
             return
 
-        # Mark payment as successful
-        await PaymentModel.mark_payment_success(inv_id, raw_payload)
-
-        # Save payment record
-        await EventModel.log_event(
-            user_id=user_id,
-            event_type='payment_success',
-            meta={
-                'inv_id': inv_id,
-                'plan_code': plan_code,
-                'amount': amount,
-                'raw_payload': raw_payload
-            }
-        )
-
-        # Check if user has active subscription
-        existing_subscription = await SubscriptionModel.get_active_subscription(user_id)
-
-        if existing_subscription:
-            # Extend existing subscription
-            await SubscriptionModel.extend_subscription(user_id, plan_code, amount)
-            logger.info(f"Extended subscription for user {user_id}, plan {plan_code}")
-        else:
-            # Create new subscription
-            await SubscriptionModel.create_subscription(user_id, plan_code, amount, inv_id)
+        if result['created']:
             logger.info(f"Created new subscription for user {user_id}, plan {plan_code}")
+        else:
+            logger.info(f"Extended subscription for user {user_id}, plan {plan_code}")
 
         # Send confirmation message to user
         try:
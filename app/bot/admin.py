@@ -1,9 +1,8 @@
 from aiogram import types, Router
 from aiogram.filters import Command
 from datetime import datetime, date, timedelta
-from io import BytesIO
 
-from app.database.models import MetricsModel
+from app.database.models import MetricsModel, UserModel
 from app.database.connection import db
 from app.config import config
 import logging
@@ -11,8 +10,58 @@ import logging
 logger = logging.getLogger(__name__)
 admin_router = Router()
 
+# Fixed statement texts, so repeated commands hit asyncpg's per-connection statement cache
+RANGE_TOTALS_SQL = """
+    SELECT COUNT(*) AS days,
+           COALESCE(SUM(dau), 0) AS total_dau,
+           COALESCE(AVG(dau), 0) AS avg_dau,
+           COALESCE(SUM(new_users), 0) AS total_new,
+           COALESCE(SUM(questions), 0) AS total_questions,
+           COALESCE(SUM(revenue), 0) AS total_revenue
+    FROM fact_daily_metrics
+    WHERE d BETWEEN $1 AND $2
+"""
+
+# Column order matches EXPORT_TSV_HEADER
+EXPORT_METRICS_SQL = """
+    SELECT d AS date, dau, new_users, active_users, blocked_total,
+           daily_sent, paid_active, paid_new, questions, revenue
+    FROM fact_daily_metrics
+    WHERE d BETWEEN $1 AND $2
+    ORDER BY d
+"""
+
+EXPORT_TSV_HEADER = '\t'.join([
+    'date', 'dau', 'new_users', 'active_users', 'blocked_total',
+    'daily_sent', 'paid_active', 'paid_new', 'questions', 'revenue'
+]).encode() + b'\n'
+
+PAID_USERS_SQL = """
+    SELECT u.tg_user_id, u.username, s.plan_code,
+           to_char(s.ends_at, 'DD.MM.YYYY') AS ends_fmt
+    FROM subscriptions s
+    JOIN users u ON s.user_id = u.id
+    WHERE s.status = 'active' AND s.ends_at > now()
+    ORDER BY s.ends_at DESC
+    LIMIT 50
+"""
+
+BLOCKED_USERS_SQL = """
+    SELECT tg_user_id, username,
+           COALESCE(to_char(blocked_at, 'DD.MM.YYYY'), 'неизвестно') AS blocked_fmt
+    FROM users
+    WHERE is_blocked = true
+    ORDER BY blocked_at DESC
+    LIMIT 50
+"""
+
+_ADMIN_IDS = config.ADMIN_IDS_SET
+
 def is_admin(user_id: int) -> bool:
-    return user_id in config.ADMIN_IDS
+    return user_id in _ADMIN_IDS
+
+def _user_label(row) -> str:
+    return f"@{row['username']}" if row['username'] else f"ID:{row['tg_user_id']}"
 
 def escape_markdown(text: str) -> str:
     """Escape markdown special characters"""
@@ -67,35 +116,21 @@ async def admin_range(message: types.Message):
         if date1 > date2:
             date1, date2 = date2, date1
 
-        rows = await db.fetch(
-            """
-            SELECT * FROM fact_daily_metrics
-            WHERE d BETWEEN $1 AND $2
-            ORDER BY d
-            """,
-            date1, date2
-        )
+        totals = await db.fetchrow(RANGE_TOTALS_SQL, date1, date2)
 
-        if not rows:
+        if not totals['days']:
             await message.answer("📭 Нет данных за указанный период")
             return
 
-        # Calculate totals
-        total_dau = sum(row['dau'] for row in rows)
-        total_new = sum(row['new_users'] for row in rows)
-        total_revenue = sum(row['revenue'] for row in rows)
-        total_questions = sum(row['questions'] for row in rows)
-        avg_dau = total_dau / len(rows) if rows else 0
-
         text = f"""
 📊 **Статистика за период {date1_str} — {date2_str}**
 
-📅 Дней: {len(rows)}
-👥 Общий DAU: {total_dau}
-📊 Средний DAU: {avg_dau:.1f}
-🆕 Новых пользователей: {total_new}
-❓ Всего вопросов: {total_questions}
-💰 Общая выручка: {total_revenue} ₽
+📅 Дней: {totals['days']}
+👥 Общий DAU: {totals['total_dau']}
+📊 Средний DAU: {totals['avg_dau']:.1f}
+🆕 Новых пользователей: {totals['total_new']}
+❓ Всего вопросов: {totals['total_questions']}
+💰 Общая выручка: {totals['total_revenue']} ₽
 
 Для подробной выгрузки используйте /admin_export
 """
@@ -126,36 +161,23 @@ async def admin_export(message: types.Message):
         if date1 > date2:
             date1, date2 = date2, date1
 
-        rows = await db.fetch(
-            """
-            SELECT * FROM fact_daily_metrics
-            WHERE d BETWEEN $1 AND $2
-            ORDER BY d
-            """,
-            date1, date2
-        )
+        # Rows are appended to the TSV as they come off the cursor
+        tsv = bytearray(EXPORT_TSV_HEADER)
+        rows_count = 0
 
-        if not rows:
+        async with db.pool.acquire() as conn:
+            async with conn.transaction():
+                async for row in conn.cursor(EXPORT_METRICS_SQL, date1, date2):
+                    tsv += '\t'.join(['0' if value is None else str(value) for value in row]).encode()
+                    tsv += b'\n'
+                    rows_count += 1
+
+        if not rows_count:
             await message.answer("📭 Нет данных за указанный период")
             return
 
-        # Create TSV content
-        headers = ['date', 'dau', 'new_users', 'active_users', 'blocked_total',
-                  'daily_sent', 'paid_active', 'paid_new', 'questions', 'revenue']
-
-        tsv_lines = ['\t'.join(headers)]
-
-        for row in rows:
-            line = '\t'.join([str(row[header] if row[header] is not None else 0) for header in headers])
-            tsv_lines.append(line)
-
-        tsv_content = '\n'.join(tsv_lines)
-
-        # Create file
-        file_buffer = BytesIO(tsv_content.encode('utf-8'))
         filename = f"stats_{date1_str}_{date2_str}.tsv"
-
-        file = types.BufferedInputFile(file_buffer.getvalue(), filename=filename)
+        file = types.BufferedInputFile(bytes(tsv), filename=filename)
 
         await message.answer_document(
             file,
@@ -174,28 +196,18 @@ async def admin_paid(message: types.Message):
         return
 
     try:
-        rows = await db.fetch(
-            """
-            SELECT u.tg_user_id, u.username, s.plan_code, s.ends_at
-            FROM subscriptions s
-            JOIN users u ON s.user_id = u.id
-            WHERE s.status = 'active' AND s.ends_at > now()
-            ORDER BY s.ends_at DESC
-            LIMIT 50
-            """
-        )
+        rows = await db.fetch(PAID_USERS_SQL)
 
         if not rows:
             await message.answer("📭 Нет активных подписчиков")
             return
 
-        text = "💎 **Активные подписчики (последние 50):**\n\n"
-
-        for row in rows:
-            username = f"@{row['username']}" if row['username'] else f"ID:{row['tg_user_id']}"
-            plan = row['plan_code']
-            end_date = row['ends_at'].strftime('%d.%m.%Y')
-            text += f"• {username} — {plan} до {end_date}\n"
+        parts = ["💎 **Активные подписчики (последние 50):**\n\n"]
+        parts.extend(
+            f"• {_user_label(row)} — {row['plan_code']} до {row['ends_fmt']}\n"
+            for row in rows
+        )
+        text = ''.join(parts)
 
         if len(text) > 4000:
             text = text[:3900] + "\n\n... (список обрезан)"
@@ -212,26 +224,18 @@ async def admin_blocked(message: types.Message):
         return
 
     try:
-        rows = await db.fetch(
-            """
-            SELECT tg_user_id, username, blocked_at
-            FROM users
-            WHERE is_blocked = true
-            ORDER BY blocked_at DESC
-            LIMIT 50
-            """
-        )
+        rows = await db.fetch(BLOCKED_USERS_SQL)
 
         if not rows:
             await message.answer("✅ Нет заблокированных пользователей")
             return
 
-        text = "🚫 **Заблокированные пользователи (последние 50):**\n\n"
-
-        for row in rows:
-            username = f"@{row['username']}" if row['username'] else f"ID:{row['tg_user_id']}"
-            blocked_date = row['blocked_at'].strftime('%d.%m.%Y') if row['blocked_at'] else "неизвестно"
-            text += f"• {username} — {blocked_date}\n"
+        parts = ["🚫 **Заблокированные пользователи (последние 50):**\n\n"]
+        parts.extend(
+            f"• {_user_label(row)} — {row['blocked_fmt']}\n"
+            for row in rows
+        )
+        text = ''.join(parts)
 
         if len(text) > 4000:
             text = text[:3900] + "\n\n... (список обрезан)"
@@ -404,6 +408,7 @@ async def admin_block_user(message: types.Message):
             "UPDATE users SET is_blocked = true, blocked_at = now() WHERE tg_user_id = $1",
             target_user_id
         )
+        UserModel.invalidate(tg_user_id=target_user_id)
 
         username = f"@{user['username']}" if user['username'] else f"ID:{target_user_id}"
         await message.answer(f"🚫 Пользователь {escape_markdown(username)} заблокирован", parse_mode="Markdown")
@@ -441,6 +446,7 @@ async def admin_unblock_user(message: types.Message):
             "UPDATE users SET is_blocked = false, blocked_at = NULL WHERE tg_user_id = $1",
             target_user_id
         )
+        UserModel.invalidate(tg_user_id=target_user_id)
 
         username = f"@{user['username']}" if user['username'] else f"ID:{target_user_id}"
         await message.answer(f"✅ Пользователь {escape_markdown(username)} разблокирован", parse_mode="Markdown")
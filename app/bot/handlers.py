@@ -1,11 +1,10 @@
 from aiogram import types, Router, F
 from aiogram.filters import Command
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from datetime import datetime
 import uuid
 
 from app.database.models import UserModel, SubscriptionModel, QuestionModel, DailyMessageModel, PaymentModel
-from app.utils.gpt import get_gpt_response
+from app.services.ai_client import call_generic_ai
 from app.utils.robokassa import generate_payment_url
 from app.config import config
 import logging
@@ -207,11 +206,8 @@ async def payment_handler(callback: types.CallbackQuery):
     # Generate payment
     amount = config.WEEK_PRICE if plan == "week" else config.MONTH_PRICE
     plan_code = "WEEK" if plan == "week" else "MONTH"
-    # Generate unique numeric invoice ID for Robokassa (must be 1-2147483647)
-    inv_id = int(datetime.now().timestamp())
-
-    # Create payment record in database
-    await PaymentModel.create_payment(user['id'], inv_id, plan_code, amount)
+    # Create payment record in database; the invoice id comes from payments_inv_id_seq
+    inv_id = await PaymentModel.create_payment(user['id'], plan_code, amount)
 
     # Avoid special characters in description for Robokassa
     username = callback.from_user.username or str(callback.from_user.id)
@@ -327,7 +323,7 @@ async def question_handler(message: types.Message):
         thinking_msg = await message.answer("🤔 Обрабатываю ваш вопрос...")
 
         # Get GPT response
-        answer, tokens = await get_gpt_response(message.text)
+        answer, tokens = await call_generic_ai(message.text)
 
         # Delete thinking message
         await thinking_msg.delete()
@@ -340,8 +336,7 @@ async def question_handler(message: types.Message):
 
         # Update counters
         if not subscription:
-            await UserModel.use_free_question(user['id'])
-            remaining = user['free_questions_left'] - 1
+            remaining = await UserModel.use_free_question(user['id']) or 0
             if remaining > 0:
                 await message.answer(f"📊 Осталось бесплатных вопросов: {remaining}")
             else:
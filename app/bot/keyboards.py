@@ -3,38 +3,43 @@ Keyboards for Bot Oracle
 """
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 
+# Static menus are built once at import and shared by every handler call
+
+# All users get the Oracle button (behavior differs based on subscription)
+_MAIN_MENU = ReplyKeyboardMarkup(
+    keyboard=[
+        [KeyboardButton(text="🔮 Задать вопрос Оракулу")],
+        [KeyboardButton(text="📨 Сообщение дня")],
+        [KeyboardButton(text="💎 Подписка"), KeyboardButton(text="ℹ️ Мой статус")],
+    ],
+    resize_keyboard=True,
+    persistent=True
+)
+
+_SUBSCRIPTION_MENU = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [InlineKeyboardButton(text="1️⃣ День (99₽)", callback_data="BUY_DAY")],
+        [InlineKeyboardButton(text="2️⃣ Неделя (299₽)", callback_data="BUY_WEEK")],
+        [InlineKeyboardButton(text="3️⃣ Месяц (899₽)", callback_data="BUY_MONTH")],
+    ]
+)
+
+_GENDER_KEYBOARD = ReplyKeyboardMarkup(
+    keyboard=[
+        [KeyboardButton(text="Мужчина"), KeyboardButton(text="Женщина")],
+        [KeyboardButton(text="Другое")]
+    ],
+    resize_keyboard=True,
+    one_time_keyboard=True
+)
+
 def get_main_menu(has_subscription: bool = False) -> ReplyKeyboardMarkup:
     """Main menu keyboard - Oracle button available for everyone"""
-    # All users get the Oracle button (behavior differs based on subscription)
-    return ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text="🔮 Задать вопрос Оракулу")],
-            [KeyboardButton(text="📨 Сообщение дня")],
-            [KeyboardButton(text="💎 Подписка"), KeyboardButton(text="ℹ️ Мой статус")],
-        ],
-        resize_keyboard=True,
-        persistent=True
-    )
+    return _MAIN_MENU
 
 def get_subscription_menu() -> InlineKeyboardMarkup:
     """Subscription options inline keyboard (old callback version)"""
-    return InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text="1️⃣ День (99₽)", callback_data="BUY_DAY")],
-            [InlineKeyboardButton(text="2️⃣ Неделя (299₽)", callback_data="BUY_WEEK")],
-            [InlineKeyboardButton(text="3️⃣ Месяц (899₽)", callback_data="BUY_MONTH")],
-        ]
-    )
-
-def get_subscription_menu_with_urls(url_day: str, url_week: str, url_month: str) -> InlineKeyboardMarkup:
-    """Subscription options with direct payment URLs"""
-    return InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text="1️⃣ День (99₽)", url=url_day)],
-            [InlineKeyboardButton(text="2️⃣ Неделя (299₽)", url=url_week)],
-            [InlineKeyboardButton(text="3️⃣ Месяц (899₽)", url=url_month)],
-        ]
-    )
+    return _SUBSCRIPTION_MENU
 
 def get_subscription_menu_with_urls(url_day: str, url_week: str, url_month: str) -> InlineKeyboardMarkup:
     """Subscription options with direct payment URLs"""
@@ -48,11 +53,4 @@ def get_subscription_menu_with_urls(url_day: str, url_week: str, url_month: str)
 
 def get_gender_keyboard() -> ReplyKeyboardMarkup:
     """Gender selection keyboard"""
-    return ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text="Мужчина"), KeyboardButton(text="Женщина")],
-            [KeyboardButton(text="Другое")]
-        ],
-        resize_keyboard=True,
-        one_time_keyboard=True
-    )
\ No newline at end of file
+    return _GENDER_KEYBOARD
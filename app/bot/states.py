@@ -1,7 +1,11 @@
 """
-FSM States for Bot Oracle onboarding questionnaire and Oracle questions
+FSM States for Bot Oracle onboarding questionnaire and Oracle questions, and their storage
 """
 from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from app.config import config
 
 class OnboardingStates(StatesGroup):
     """States for user onboarding questionnaire"""
@@ -15,4 +19,14 @@ class OracleQuestionStates(StatesGroup):
 
 class AdminQuestionStates(StatesGroup):
     """States for Admin question flow (non-subscribers via Oracle button)"""
-    waiting_for_question = State()
\ No newline at end of file
+    waiting_for_question = State()
+
+def create_storage() -> BaseStorage:
+    """FSM storage - Redis when REDIS_URL is set, in-memory otherwise"""
+    if not config.REDIS_URL:
+        return MemoryStorage()
+
+    # Imported here so the redis package is only needed when it is configured
+    from aiogram.fsm.storage.redis import DefaultKeyBuilder, RedisStorage
+
+    return RedisStorage.from_url(config.REDIS_URL, key_builder=DefaultKeyBuilder(with_bot_id=True))
@@ -1,27 +1,80 @@
+import asyncio
 import asyncpg
-from typing import Optional
+from asyncpg.prepared_stmt import PreparedStatement
+from typing import Dict, Optional
 from app.config import config
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Result sets larger than this are read through a cursor instead of one fetch()
+FETCH_BATCH_SIZE = 500
+
+class PreparedConnection(asyncpg.Connection):
+    """Pool connection that keeps its named prepared statements for its whole lifetime"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared: Dict[str, PreparedStatement] = {}
+
 class Database:
     def __init__(self):
         self.pool: Optional[asyncpg.Pool] = None
+        self._statements: Dict[str, str] = {}
+
+    def register_statement(self, name: str, query: str):
+        """Register a hot query to be prepared on every pool connection"""
+        self._statements[name] = query
+
+    async def _init_connection(self, conn: PreparedConnection):
+        for name, query in self._statements.items():
+            conn.prepared[name] = await conn.prepare(query)
+
+    async def statement(self, conn, name: str, reprepare: bool = False):
+        """Prepared statement for an acquired connection, prepared lazily if registered late"""
+        stmt = None if reprepare else conn.prepared.get(name)
+        if stmt is None:
+            stmt = conn.prepared[name] = await conn.prepare(self._statements[name])
+        return stmt
+
+    async def _run_prepared(self, name: str, method: str, *args):
+        async with self.pool.acquire() as conn:
+            stmt = await self.statement(conn, name)
+            try:
+                return await getattr(stmt, method)(*args)
+            except asyncpg.exceptions.InvalidCachedStatementError:
+                # A live migration changed a table the statement reads (e.g. ADD COLUMN under
+                # SELECT *); asyncpg never re-prepares explicit statements, so do it here
+                logger.info(f"Re-preparing statement {name} after a schema change")
+                stmt = await self.statement(conn, name, reprepare=True)
+                return await getattr(stmt, method)(*args)
 
     async def connect(self):
         try:
             self.pool = await asyncpg.create_pool(
                 config.DATABASE_URL,
-                min_size=5,
-                max_size=20,
-                command_timeout=60
+                min_size=config.POOL_MIN_SIZE,
+                max_size=config.POOL_MAX_SIZE,
+                command_timeout=60,
+                statement_cache_size=config.STATEMENT_CACHE_SIZE,
+                connection_class=PreparedConnection,
+                init=self._init_connection
             )
+            # create_pool has already opened min_size connections; make sure they are all usable
+            await self.warmup()
             logger.info("Database connected successfully")
         except Exception as e:
             logger.error(f"Database connection failed: {e}")
             raise
 
+    async def warmup(self):
+        """Run a round trip on every idle connection so the first requests skip connect latency"""
+        connections = await asyncio.gather(*[self.pool.acquire() for _ in range(self.pool.get_min_size())])
+        try:
+            await asyncio.gather(*[conn.execute("SELECT 1") for conn in connections])
+        finally:
+            await asyncio.gather(*[self.pool.release(conn) for conn in connections])
+
     async def disconnect(self):
         if self.pool:
             await self.pool.close()
@@ -43,4 +96,22 @@ class Database:
         async with self.pool.acquire() as conn:
             return await conn.fetchval(query, *args)
 
+    async def fetch_dicts(self, query: str, *args, batched: bool = False):
+        """Fetch rows as dicts; batched reads go through a cursor so no Record list is kept"""
+        async with self.pool.acquire() as conn:
+            if not batched:
+                return [dict(row) for row in await conn.fetch(query, *args)]
+
+            async with conn.transaction():
+                return [dict(row) async for row in conn.cursor(query, *args, prefetch=FETCH_BATCH_SIZE)]
+
+    async def fetch_prepared(self, name: str, *args):
+        return await self._run_prepared(name, 'fetch', *args)
+
+    async def fetchval_prepared(self, name: str, *args):
+        return await self._run_prepared(name, 'fetchval', *args)
+
+    async def fetchrow_prepared(self, name: str, *args):
+        return await self._run_prepared(name, 'fetchrow', *args)
+
 db = Database()
\ No newline at end of file
@@ -1,15 +1,78 @@
 from datetime import datetime, date
 from typing import Optional, Dict, Any
+from weakref import WeakValueDictionary
+from asyncpg import Record
 from app.database.connection import db
 from app.config import config
+from app.utils.cache import TTLCache
+import asyncio
 import logging
-import json
+import orjson
+import random
 
 logger = logging.getLogger(__name__)
 
+# Users by tg_user_id for the bot handlers, kept as the immutable asyncpg rows; ('id', users.id) entries map back
+# to tg_user_id so writes keyed by internal id can invalidate too
+USER_CACHE_TTL = 60
+_user_cache = TTLCache(maxsize=100_000)
+_user_locks: "WeakValueDictionary[int, asyncio.Lock]" = WeakValueDictionary()
+
+# Active subscription (or None) by users.id; entries never outlive ends_at
+SUBSCRIPTION_CACHE_TTL = 60
+_subscription_cache = TTLCache(maxsize=100_000)
+_MISSING = object()
+
+# Ids of active daily messages, so a random pick is an index lookup
+DAILY_MESSAGE_IDS_TTL = 300
+_daily_message_ids = TTLCache(maxsize=1)
+
+# Queries run on nearly every bot update, prepared once per pool connection
+db.register_statement('user_by_tg_id', "SELECT * FROM users WHERE tg_user_id = $1")
+
+db.register_statement('user_status_bundle', """
+    SELECT u.*,
+           s.ends_at AS subscription_ends_at,
+           (SELECT COUNT(*) FROM oracle_questions q
+            WHERE q.user_id = u.id AND q.asked_date = CURRENT_DATE
+              AND q.source = 'SUB') AS oracle_used,
+           EXISTS (SELECT 1 FROM daily_sent d
+                   WHERE d.user_id = u.id AND d.sent_date = CURRENT_DATE) AS daily_sent
+    FROM users u
+    LEFT JOIN LATERAL (
+        SELECT ends_at FROM subscriptions
+        WHERE user_id = u.id AND status = 'active' AND ends_at > now()
+        ORDER BY ends_at DESC LIMIT 1
+    ) s ON true
+    WHERE u.tg_user_id = $1
+""")
+
+db.register_statement('active_subscription', """
+    SELECT *, EXTRACT(EPOCH FROM ends_at - now())::float8 AS expires_in
+    FROM subscriptions
+    WHERE user_id = $1 AND status = 'active' AND ends_at > now()
+    ORDER BY ends_at DESC LIMIT 1
+""")
+
+db.register_statement('daily_sent_today', """
+    SELECT EXISTS (
+        SELECT 1 FROM daily_sent
+        WHERE user_id = $1 AND sent_date = CURRENT_DATE
+    )
+""")
+
+db.register_statement('oracle_questions_today', """
+    SELECT COUNT(*) FROM oracle_questions
+    WHERE user_id = $1 AND asked_date = CURRENT_DATE AND source = $2
+""")
+
+def _json_dumps(value) -> str:
+    """JSON text for JSONB parameters"""
+    return orjson.dumps(value).decode()
+
 class UserModel:
     @staticmethod
-    async def get_or_create_user(tg_user_id: int, username: str = None) -> dict:
+    async def get_or_create_user(tg_user_id: int, username: str = None) -> Record:
         user = await db.fetchrow(
             "SELECT * FROM users WHERE tg_user_id = $1",
             tg_user_id
@@ -36,16 +99,45 @@ class UserModel:
                 tg_user_id
             )
 
-        return dict(user)
+        return user
 
     @staticmethod
-    async def get_by_tg_id(tg_user_id: int) -> Optional[dict]:
-        """Get user by telegram ID"""
-        user = await db.fetchrow(
-            "SELECT * FROM users WHERE tg_user_id = $1",
-            tg_user_id
-        )
-        return dict(user) if user else None
+    async def get_by_tg_id(tg_user_id: int) -> Optional[Record]:
+        """Get user by telegram ID, served from the user cache when fresh"""
+        user = _user_cache.get(tg_user_id)
+        if user is not None:
+            return user
+
+        # One query per cold key, however many updates arrive for it at once
+        lock = _user_locks.get(tg_user_id)
+        if lock is None:
+            lock = _user_locks[tg_user_id] = asyncio.Lock()
+
+        async with lock:
+            user = _user_cache.get(tg_user_id)
+            if user is None:
+                user = await db.fetchrow_prepared('user_by_tg_id', tg_user_id)
+                if not user:
+                    return None
+
+                _user_cache.set(tg_user_id, user, USER_CACHE_TTL)
+                _user_cache.set(('id', user['id']), tg_user_id, USER_CACHE_TTL)
+
+        return user
+
+    @staticmethod
+    async def get_status_bundle(tg_user_id: int) -> Optional[Record]:
+        """Get user with active subscription end, today's Oracle questions and daily message flag"""
+        return await db.fetchrow_prepared('user_status_bundle', tg_user_id)
+
+    @staticmethod
+    def invalidate(tg_user_id: int = None, user_id: int = None):
+        """Drop a cached user by telegram ID or internal ID"""
+        if user_id is not None:
+            tg_user_id = _user_cache.get(('id', user_id), tg_user_id)
+            _user_cache.invalidate(('id', user_id))
+        if tg_user_id is not None:
+            _user_cache.invalidate(tg_user_id)
 
     @staticmethod
     async def get_by_id(user_id: int) -> Optional[dict]:
@@ -63,6 +155,7 @@ class UserModel:
             "UPDATE users SET age = $1, gender = $2 WHERE tg_user_id = $3",
             age, gender, tg_user_id
         )
+        UserModel.invalidate(tg_user_id=tg_user_id)
 
     @staticmethod
     async def init_user_preferences(user_id: int):
@@ -100,31 +193,41 @@ class UserModel:
             "UPDATE users SET is_blocked = $1, blocked_at = now() WHERE id = $2",
             blocked, user_id
         )
+        UserModel.invalidate(user_id=user_id)
 
     @staticmethod
-    async def use_free_question(user_id: int) -> bool:
-        result = await db.execute(
+    async def use_free_question(user_id: int) -> Optional[int]:
+        """Spend one free question; returns how many are left, or None if none were"""
+        remaining = await db.fetchval(
             """
             UPDATE users
             SET free_questions_left = free_questions_left - 1
             WHERE id = $1 AND free_questions_left > 0
+            RETURNING free_questions_left
             """,
             user_id
         )
-        return result == "UPDATE 1"
+        UserModel.invalidate(user_id=user_id)
+        return remaining
 
 class SubscriptionModel:
     @staticmethod
-    async def get_active_subscription(user_id: int) -> Optional[dict]:
-        subscription = await db.fetchrow(
-            """
-            SELECT * FROM subscriptions
-            WHERE user_id = $1 AND status = 'active' AND ends_at > now()
-            ORDER BY ends_at DESC LIMIT 1
-            """,
-            user_id
-        )
-        return dict(subscription) if subscription else None
+    async def get_active_subscription(user_id: int) -> Optional[Record]:
+        cached = _subscription_cache.get(user_id, _MISSING)
+        if cached is not _MISSING:
+            return cached
+
+        subscription = await db.fetchrow_prepared('active_subscription', user_id)
+        ttl = SUBSCRIPTION_CACHE_TTL
+        if subscription:
+            ttl = min(ttl, subscription['expires_in'])
+        _subscription_cache.set(user_id, subscription, ttl)
+        return subscription
+
+    @staticmethod
+    def invalidate(user_id: int):
+        """Drop the cached active subscription after it was created, extended or removed"""
+        _subscription_cache.invalidate(user_id)
 
     @staticmethod
     async def create_subscription(user_id: int, plan_code: str, amount: float,
@@ -139,6 +242,7 @@ class SubscriptionModel:
             """ % days,
             user_id, plan_code, str(inv_id) if inv_id else None, amount
         )
+        SubscriptionModel.invalidate(user_id)
 
         await EventModel.log_event(
             user_id=user_id,
@@ -160,6 +264,7 @@ class SubscriptionModel:
             """ % days,
             user_id
         )
+        SubscriptionModel.invalidate(user_id)
 
 class QuestionModel:
     @staticmethod
@@ -191,42 +296,70 @@ class QuestionModel:
 
 class DailyMessageModel:
     @staticmethod
-    async def get_random_message() -> Optional[dict]:
-        message = await db.fetchrow(
-            """
-            SELECT * FROM daily_messages
-            WHERE is_active = true
-            ORDER BY RANDOM()
-            LIMIT 1
-            """
-        )
-        return dict(message) if message else None
+    async def get_random_message() -> Optional[Record]:
+        # Retry once with fresh ids if the picked message was edited meanwhile
+        for _ in range(2):
+            ids = _daily_message_ids.get('active')
+            if ids is None:
+                rows = await db.fetch("SELECT id FROM daily_messages WHERE is_active = true")
+                ids = [row['id'] for row in rows]
+                _daily_message_ids.set('active', ids, DAILY_MESSAGE_IDS_TTL)
+
+            if not ids:
+                return None
+
+            message = await db.fetchrow(
+                "SELECT * FROM daily_messages WHERE id = $1 AND is_active = true",
+                random.choice(ids)
+            )
+            if message:
+                return message
+
+            DailyMessageModel.invalidate_active_ids()
+
+        return None
+
+    @staticmethod
+    def invalidate_active_ids():
+        _daily_message_ids.invalidate()
 
     @staticmethod
     async def mark_sent(user_id: int, message_id: int = None):
         """Mark daily message as sent. message_id is optional for AI-generated messages."""
         await db.execute(
-            "INSERT INTO daily_sent (user_id) VALUES ($1)",
+            "INSERT INTO daily_sent (user_id) VALUES ($1) ON CONFLICT (user_id, sent_date) DO NOTHING",
             user_id
         )
 
     @staticmethod
-    async def is_sent_today(user_id: int) -> bool:
-        count = await db.fetchval(
+    async def mark_sent_once(user_id: int) -> Optional[int]:
+        """Mark today's daily message as sent unless it already was; returns the new row id or None
+
+        Atomic through the unique (user_id, sent_date) index from migration 012.
+        """
+        return await db.fetchval(
             """
-            SELECT COUNT(*) FROM daily_sent
-            WHERE user_id = $1 AND sent_date = CURRENT_DATE
+            INSERT INTO daily_sent (user_id) VALUES ($1)
+            ON CONFLICT (user_id, sent_date) DO NOTHING
+            RETURNING id
             """,
             user_id
         )
-        return (count or 0) > 0
+
+    @staticmethod
+    async def unmark_sent(sent_id: int):
+        await db.execute("DELETE FROM daily_sent WHERE id = $1", sent_id)
+
+    @staticmethod
+    async def is_sent_today(user_id: int) -> bool:
+        return await db.fetchval_prepared('daily_sent_today', user_id)
 
 class EventModel:
     @staticmethod
     async def log_event(user_id: Optional[int], event_type: str, meta: Dict[str, Any] = None):
         await db.execute(
             "INSERT INTO events (user_id, type, meta) VALUES ($1, $2, $3)",
-            user_id, event_type, json.dumps(meta or {})
+            user_id, event_type, _json_dumps(meta or {})
         )
 
 class MetricsModel:
@@ -286,7 +419,7 @@ class MetricsModel:
             'paid_active': paid_active,
             'paid_new': paid_new,
             'questions': metrics['questions'] or 0,
-            'revenue': float(metrics['revenue'] or 0)
+            'revenue': metrics['revenue'] or 0
         }
 
     @staticmethod
@@ -334,14 +467,7 @@ class OracleQuestionModel:
     @staticmethod
     async def count_today_questions(user_id: int, source: str = 'SUB') -> int:
         """Count Oracle questions asked today for subscription users"""
-        count = await db.fetchval(
-            """
-            SELECT COUNT(*) FROM oracle_questions
-            WHERE user_id = $1 AND asked_date = CURRENT_DATE AND source = $2
-            """,
-            user_id, source
-        )
-        return count or 0
+        return await db.fetchval_prepared('oracle_questions_today', user_id, source)
 
 
 class AdminTaskModel:
@@ -354,7 +480,7 @@ class AdminTaskModel:
             VALUES ($1, $2, $3, $4, now())
             RETURNING id
             """,
-            user_id, task_type, due_at, json.dumps(payload or {})
+            user_id, task_type, due_at, _json_dumps(payload or {})
         )
 
         await EventModel.log_event(
@@ -529,16 +655,16 @@ class UserPrefsModel:
 
 class PaymentModel:
     @staticmethod
-    async def create_payment(user_id: int, inv_id: int, plan_code: str, amount: float) -> int:
-        payment_id = await db.fetchval(
+    async def create_payment(user_id: int, plan_code: str, amount: float) -> int:
+        """Create a pending payment; returns its Robokassa inv_id, taken from payments_inv_id_seq"""
+        return await db.fetchval(
             """
             INSERT INTO payments (user_id, inv_id, plan_code, amount, status, created_at)
-            VALUES ($1, $2, $3, $4, 'pending', now())
-            RETURNING id
+            VALUES ($1, nextval('payments_inv_id_seq'), $2, $3, 'pending', now())
+            RETURNING inv_id
             """,
-            user_id, inv_id, plan_code, amount
+            user_id, plan_code, amount
         )
-        return payment_id
 
     @staticmethod
     async def get_payment_by_inv_id(inv_id: int):
@@ -555,8 +681,61 @@ class PaymentModel:
             SET status = 'success', paid_at = now(), raw_payload = $2
             WHERE inv_id = $1
             """,
-            inv_id, json.dumps(raw_payload) if raw_payload else None
+            inv_id, _json_dumps(raw_payload) if raw_payload else None
+        )
+
+    @staticmethod
+    async def apply_successful_payment(inv_id: int, plan_code: str, amount: float,
+                                       raw_payload: dict = None) -> Optional[dict]:
+        """Mark payment paid, log it and extend or start the subscription; None if already processed"""
+        days = 1 if plan_code == 'DAY' else (7 if plan_code == 'WEEK' else 30)
+        payment_meta = {
+            'inv_id': inv_id,
+            'plan_code': plan_code,
+            'amount': amount,
+            'raw_payload': raw_payload
+        }
+        subscription_meta = {'plan_code': plan_code, 'amount': amount, 'days': days}
+
+        result = await db.fetchrow(
+            """
+            WITH p AS (
+                UPDATE payments
+                SET status = 'success', paid_at = now(), raw_payload = $2
+                WHERE inv_id = $1 AND status IS DISTINCT FROM 'success'
+                RETURNING user_id
+            ),
+            extended AS (
+                UPDATE subscriptions s
+                SET ends_at = GREATEST(s.ends_at, now()) + make_interval(days => $4)
+                FROM p
+                WHERE s.user_id = p.user_id AND s.status = 'active' AND s.ends_at > now()
+                RETURNING s.id
+            ),
+            created AS (
+                INSERT INTO subscriptions (user_id, plan_code, ends_at, robokassa_inv_id, amount)
+                SELECT p.user_id, $3, now() + make_interval(days => $4), $1::text, $5
+                FROM p
+                WHERE NOT EXISTS (SELECT 1 FROM extended)
+                RETURNING id
+            ),
+            logged AS (
+                INSERT INTO events (user_id, type, meta)
+                SELECT p.user_id, 'payment_success', $6::jsonb FROM p
+                UNION ALL
+                SELECT p.user_id, 'subscription_started', $7::jsonb FROM p, created
+            )
+            SELECT p.user_id, EXISTS (SELECT 1 FROM created) AS created
+            FROM p
+            """,
+            inv_id, _json_dumps(raw_payload) if raw_payload else None, plan_code, days, amount,
+            _json_dumps(payment_meta), _json_dumps(subscription_meta)
         )
+        if not result:
+            return None
+
+        SubscriptionModel.invalidate(result['user_id'])
+        return dict(result)
 
     @staticmethod
     async def mark_payment_failed(inv_id: int, raw_payload: dict = None):
@@ -566,7 +745,7 @@ class PaymentModel:
             SET status = 'failed', raw_payload = $2
             WHERE inv_id = $1
             """,
-            inv_id, json.dumps(raw_payload) if raw_payload else None
+            inv_id, _json_dumps(raw_payload) if raw_payload else None
         )
 
 
@@ -0,0 +1,114 @@
+"""
+Background writer for writes the bot's reply doesn't wait on
+Coalesces last_seen touches and admin task inserts into one statement per flush
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional
+
+import orjson
+
+from app.database.connection import db
+
+logger = logging.getLogger(__name__)
+
+# Writes queued within this window go out together
+FLUSH_INTERVAL = 0.5
+
+TOUCH_LAST_SEEN_SQL = "UPDATE users SET last_seen_at = now() WHERE id = ANY($1::int[])"
+
+CREATE_ADMIN_TASKS_SQL = """
+    WITH t AS (
+        INSERT INTO admin_tasks (user_id, type, due_at, payload, created_at)
+        SELECT user_id, type, due_at, payload::jsonb, now()
+        FROM unnest($1::int[], $2::text[], $3::timestamp[], $4::text[])
+             AS x(user_id, type, due_at, payload)
+        RETURNING id, user_id, type
+    )
+    INSERT INTO events (user_id, type, meta)
+    SELECT user_id, 'admin_task_created', jsonb_build_object('task_id', id, 'type', type)
+    FROM t
+"""
+
+
+class BackgroundWriter:
+    """Queue of fire-and-forget writes drained by a single task"""
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._flushing: Optional[asyncio.Future] = None
+
+    def touch_last_seen(self, user_id: int):
+        self._enqueue(('last_seen', user_id))
+
+    def create_admin_task(self, user_id: int, task_type: str, due_at: datetime = None,
+                          payload: dict = None):
+        self._enqueue(('admin_task', (user_id, task_type, due_at, orjson.dumps(payload or {}).decode())))
+
+    def _enqueue(self, item):
+        # Started lazily so every entrypoint gets it once the loop is running
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        self._queue.put_nowait(item)
+
+    async def _run(self):
+        while True:
+            items = [await self._queue.get()]
+            try:
+                await asyncio.sleep(FLUSH_INTERVAL)
+            except asyncio.CancelledError:
+                # Cancelled by stop() mid-window; this batch is already off the queue
+                await self._flush(items)
+                raise
+            while not self._queue.empty():
+                items.append(self._queue.get_nowait())
+            # Shielded so a stop() during the write doesn't abort it; stop() waits for it instead
+            self._flushing = asyncio.ensure_future(self._flush(items))
+            await asyncio.shield(self._flushing)
+
+    async def _flush(self, items):
+        user_ids = set()
+        tasks = []
+        for kind, value in items:
+            if kind == 'last_seen':
+                user_ids.add(value)
+            else:
+                tasks.append(value)
+
+        if user_ids:
+            try:
+                await db.execute(TOUCH_LAST_SEEN_SQL, list(user_ids))
+            except Exception as e:
+                logger.error(f"Error updating last_seen for {len(user_ids)} users: {e}")
+
+        if tasks:
+            try:
+                await db.execute(CREATE_ADMIN_TASKS_SQL, *(list(column) for column in zip(*tasks)))
+            except Exception as e:
+                logger.error(f"Error creating {len(tasks)} admin tasks: {e}")
+
+    async def stop(self):
+        """Cancel the drain task and write whatever is still queued"""
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        if self._flushing is not None and not self._flushing.done():
+            await self._flushing
+
+        items = []
+        while not self._queue.empty():
+            items.append(self._queue.get_nowait())
+        if items:
+            await self._flush(items)
+
+
+writer = BackgroundWriter()
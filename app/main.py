@@ -6,19 +6,18 @@ import asyncio
 import logging
 import os
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
-from fastapi import FastAPI
+from aiogram.types import Update
+from fastapi import FastAPI, Request
 from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
 import uvicorn
 import markdown
+import orjson
 from pathlib import Path
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+from app.utils.logs import setup_logging
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # Import configuration
@@ -26,12 +25,18 @@ from app.config import config
 
 # Import database
 from app.database.connection import db
+from app.database.writer import writer
+
+# Import AI client
+from app.services.ai_client import ai_client
 
 # Import bot components
 from app.bot.onboarding import router as onboarding_router
 from app.bot.oracle_handlers import router as oracle_router
+from app.bot.states import create_storage
 
 # Import API components
+from app.api.responses import ORJSONResponse
 from app.api.admin import router as admin_router
 from app.api.robokassa import router as robokassa_router
 
@@ -46,7 +51,8 @@ BASE_URL = os.getenv("BASE_URL", "https://consultant.sh3.su")
 app = FastAPI(
     title="Bot Oracle API",
     description="API for Bot Oracle - Telegram bot with Administrator and Oracle personas",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Include API routers
@@ -62,7 +68,7 @@ async def create_bot_app():
     bot = Bot(token=BOT_TOKEN, parse_mode="HTML")
 
     # Create dispatcher with FSM storage
-    dp = Dispatcher(storage=MemoryStorage())
+    dp = Dispatcher(storage=create_storage())
 
     # Include routers
     dp.include_router(onboarding_router)
@@ -76,6 +82,19 @@ async def create_bot_app():
 bot_instance = None
 dp_instance = None
 
+# Updates are processed after the webhook has answered Telegram; the set keeps
+# their tasks alive and the semaphore caps how many run at once
+WEBHOOK_CONCURRENCY = 1000
+_update_semaphore = asyncio.Semaphore(WEBHOOK_CONCURRENCY)
+_pending_updates = set()
+
+async def process_update(telegram_update: Update):
+    async with _update_semaphore:
+        try:
+            await dp_instance.feed_update(bot=bot_instance, update=telegram_update)
+        except Exception as e:
+            logger.error(f"Error processing update {telegram_update.update_id}: {e}")
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize bot and scheduler on app startup"""
@@ -86,10 +105,13 @@ async def startup_event():
         logger.info("🎭 Two-persona system: Administrator + Oracle")
         logger.info("🎯 CRM proactive engagement enabled")
         logger.info("👥 Personalized interactions based on user demographics")
+        logger.info(f"Event loop: {type(asyncio.get_running_loop()).__module__}")
 
         # Initialize database
         await db.connect()
 
+        await ai_client.warm_up()
+
         # Create bot and dispatcher
         bot_instance, dp_instance = await create_bot_app()
 
@@ -97,9 +119,14 @@ async def startup_event():
         scheduler = init_scheduler(bot_instance)
         await scheduler.start()
 
-        # Set webhook
+        # Set webhook; updates queued while the app was down are dropped rather than
+        # replayed in one burst, and Telegram only sends update types we handle
         webhook_url = f"{BASE_URL}/webhook"
-        await bot_instance.set_webhook(webhook_url)
+        await bot_instance.set_webhook(
+            webhook_url,
+            drop_pending_updates=True,
+            allowed_updates=dp_instance.resolve_used_update_types()
+        )
 
         logger.info(f"Webhook set to {webhook_url}")
         logger.info("Bot Oracle startup completed!")
@@ -118,22 +145,35 @@ async def shutdown_event():
 
         if bot_instance:
             await bot_instance.delete_webhook()
+
+            # Let updates already acknowledged to Telegram finish before closing the session
+            if _pending_updates:
+                await asyncio.gather(*_pending_updates, return_exceptions=True)
+
             await bot_instance.session.close()
 
+        # Write out last_seen touches and CRM tasks still queued
+        await writer.stop()
+
+        await ai_client.close()
+
         logger.info("Bot Oracle shutdown completed")
 
     except Exception as e:
         logger.error(f"Error during shutdown: {e}")
 
 @app.post("/webhook")
-async def webhook_handler(update: dict):
+async def webhook_handler(request: Request):
     """Handle incoming webhook updates"""
     global dp_instance
 
     if dp_instance:
-        from aiogram.types import Update
-        telegram_update = Update(**update)
-        await dp_instance.feed_update(bot=bot_instance, update=telegram_update)
+        update = orjson.loads(await request.body())
+        # Validate straight into the model with the bot bound, as aiogram's feed_raw_update does
+        telegram_update = Update.model_validate(update, context={"bot": bot_instance})
+        task = asyncio.create_task(process_update(telegram_update))
+        _pending_updates.add(task)
+        task.add_done_callback(_pending_updates.discard)
 
     return {"status": "ok"}
 
@@ -288,4 +328,4 @@ async def root():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000, loop="uvloop", http="httptools", log_config=None)
\ No newline at end of file
@@ -5,16 +5,14 @@ Runs both Telegram bot and FastAPI web server with enhanced CRM functionality
 import asyncio
 import logging
 import os
+import sys
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 from fastapi import FastAPI
 import uvicorn
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+from app.utils.logs import setup_logging
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # Import configuration
@@ -26,8 +24,10 @@ from app.database.connection import init_db
 # Import bot components
 from app.bot.onboarding import router as onboarding_router
 from app.bot.oracle_handlers import router as oracle_router
+from app.bot.states import create_storage
 
 # Import API components
+from app.api.responses import ORJSONResponse
 from app.api.admin import router as admin_router
 from app.api.robokassa import router as robokassa_router
 
@@ -42,7 +42,8 @@ BASE_URL = os.getenv("BASE_URL", "https://consultant.sh3.su")
 app = FastAPI(
     title="Bot Oracle API",
     description="API for Bot Oracle - Telegram bot with Administrator and Oracle personas",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Include API routers
@@ -55,7 +56,7 @@ async def create_bot_app():
     bot = Bot(token=BOT_TOKEN, parse_mode="HTML")
 
     # Create dispatcher with FSM storage
-    dp = Dispatcher(storage=MemoryStorage())
+    dp = Dispatcher(storage=create_storage())
 
     # Include routers
     dp.include_router(onboarding_router)
@@ -82,8 +83,11 @@ async def run_bot():
 
         logger.info("Bot Oracle started successfully!")
 
+        # Polling needs the webhook gone; skip the backlog instead of replaying it
+        await bot.delete_webhook(drop_pending_updates=True)
+
         # Start polling
-        await dp.start_polling(bot)
+        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
 
     except Exception as e:
         logger.error(f"Error running bot: {e}")
@@ -98,7 +102,9 @@ async def run_api():
             app,
             host="0.0.0.0",
             port=8000,
-            log_level="info"
+            http="httptools",
+            log_level="info",
+            log_config=None
         )
         server = uvicorn.Server(config)
 
@@ -115,6 +121,7 @@ async def main():
         logger.info("🎭 Two-persona system: Administrator + Oracle")
         logger.info("🎯 CRM proactive engagement enabled")
         logger.info("👥 Personalized interactions based on user demographics")
+        logger.info(f"Event loop policy: {type(asyncio.get_event_loop_policy()).__name__}")
 
         # Run bot and API concurrently
         await asyncio.gather(
@@ -129,6 +136,11 @@ async def main():
         raise
 
 if __name__ == "__main__":
+    # uvloop has no Windows build; elsewhere polling and the API share its loop
+    if sys.platform != "win32":
+        import uvloop
+        uvloop.install()
+
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
@@ -3,16 +3,196 @@ AI Client Service - GPT-4o integration for Bot Oracle
 Handles both Administrator and Oracle persona responses
 """
 import os
+import time
+import asyncio
 import logging
-from typing import Dict, Any, Optional, AsyncGenerator
-from openai import OpenAI
+from typing import Dict, Any, List, Optional, AsyncGenerator, Awaitable, Tuple
+from openai import AsyncOpenAI
 import httpx
 from datetime import datetime, timedelta
 
 from app.database.connection import db
+from app.services.answer_cache import answer_cache, answer_scope
+from app.services.user_context import UserContext
+from app.services.direct_responses import direct_response
 
 logger = logging.getLogger(__name__)
 
+# One keep-alive pool shared by every OpenAI request
+OPENAI_TIMEOUT = httpx.Timeout(30.0, connect=10.0)
+OPENAI_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=300)
+
+# The SDK retries 429s and 5xx itself with jittered exponential backoff (honouring
+# Retry-After); this caps a request at 3 attempts
+OPENAI_MAX_RETRIES = 2
+
+# After this many failed requests in a row, skip OpenAI and answer with stubs for a while
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_SECONDS = 30
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling OpenAI while the breaker is open"""
+
+
+class CircuitBreaker:
+    """Counts consecutive failures; once open, lets one trial call through per reset period"""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        # When the half-open trial went out; it expires after reset_seconds so a cancelled
+        # trial that never reports back cannot keep the breaker shut
+        self._trial_started_at: Optional[float] = None
+
+    def check(self):
+        if self._opened_at is None:
+            return
+        now = time.monotonic()
+        if now - self._opened_at < self.reset_seconds:
+            raise CircuitOpenError("OpenAI circuit breaker is open")
+        if self._trial_started_at is not None and now - self._trial_started_at < self.reset_seconds:
+            raise CircuitOpenError("OpenAI circuit breaker is half-open, trial call in flight")
+        # Half-open: this call is the trial, everyone else keeps getting stubs until it reports
+        self._trial_started_at = now
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+        self._trial_started_at = None
+
+    def record_failure(self):
+        self._failures += 1
+        if self._trial_started_at is not None:
+            # The trial failed, reopen for another full period
+            self._opened_at = time.monotonic()
+            self._trial_started_at = None
+            return
+        if self._failures >= self.failure_threshold and self._opened_at is None:
+            self._opened_at = time.monotonic()
+            logger.warning(f"OpenAI circuit breaker opened after {self._failures} failures, "
+                           f"using stubs for {self.reset_seconds}s")
+
+# Administrator instructions shared by every user. Sent first and unchanged so
+# OpenAI's automatic prompt caching can reuse the prefix; tone and selling
+# guidance for the user follow in a separate system message.
+ADMIN_STATIC_PROMPT = """Ты - Администратор в Bot Oracle. Твоя роль:
+
+ЛИЧНОСТЬ:
+- Эмоциональная, человечная, живая
+- Можешь быть игривой, обидчивой, заботливой, ревнивой
+- НЕ мудрец, НЕ философ - ты обычный помощник с эмоциями
+
+ОГРАНИЧЕНИЯ:
+- Отвечай кратко (1-3 предложения максимум)
+- Не давай глубоких философских советов - это работа Оракула
+- Всегда помни: ты админ, а не мудрец
+
+СТИЛЬ ОТВЕТА:
+- Живой, эмоциональный язык
+- Используй "я" от первого лица
+- Можешь показать характер, настроение
+
+Отвечай на русском языке."""
+
+# Persona-less consultant used by the legacy question handler
+GENERIC_SYSTEM_PROMPT = """
+Ты — доброжелательный аналитик и консультант.
+Отвечай на русском языке коротко и ясно, структурируй ответ в 3–5 пунктов.
+Будь полезным, конкретным и практичным в своих советах.
+Избегай общих фраз, давай действенные рекомендации.
+"""
+GENERIC_ERROR_MESSAGE = "Извините, произошла ошибка при обработке вашего вопроса. Попробуйте позже."
+
+# Lead-in for the question in the user message
+ADMIN_USER_PREFIX = "Пользователь спрашивает: "
+ORACLE_USER_PREFIX = "Вопрос для размышления: "
+
+# Hardcoded fallbacks, built once at import; only used when the ai_prompts rows are missing
+_ADMIN_TONES = {
+    'young': "Будь игривой, используй эмодзи, молодежный сленг. Можешь быть чуть капризной или кокетливой.",
+    'middle': "Держи баланс - дружелюбно, но не слишком игриво. Умеренное количество эмодзи.",
+    'senior': "Будь заботливой и уважительной, но сохраняй теплоту. Меньше эмодзи, более серьезный тон.",
+}
+_ADMIN_TONE_KEYS = {bucket: f"admin_tone_{bucket}" for bucket in _ADMIN_TONES}
+
+# mode -> (task description, selling guide)
+_ADMIN_MODES = {
+    # Free chat via Oracle button - no selling, no counter mentions
+    'free_chat': ("помочь пользователю",
+                  "- Просто помогай и общайся. НЕ упоминай счетчики вопросов или лимиты"),
+    'subscriber': ("помочь пользователю",
+                   "- Для серьезных или философских вопросов предлагай воспользоваться кнопкой '🔮 Задать вопрос Оракулу' - он даст более глубокий ответ"),
+    'prospect': ("помочь пользователю и мягко продать подписку на Оракула",
+                 "- Можешь иногда намекнуть на подписку к Оракулу для серьезных вопросов"),
+}
+
+_ADMIN_CONTEXT_PROMPTS = {
+    (bucket, mode): f"""ТВОЯ ЗАДАЧА: {task_description}
+
+ТОНАЛЬНОСТЬ: {tone_guide}
+
+ДОПОЛНИТЕЛЬНО:
+{selling_guide}"""
+    for bucket, tone_guide in _ADMIN_TONES.items()
+    for mode, (task_description, selling_guide) in _ADMIN_MODES.items()
+}
+
+ORACLE_FALLBACK_PROMPT = """Ты - Оракул в Bot Oracle. Твоя роль:
+
+ЛИЧНОСТЬ:
+- Мудрый, спокойный, глубокий мыслитель
+- Даешь взвешенные, продуманные ответы
+- Говоришь размеренно, без суеты и эмоций
+- Твоя мудрость стоит денег - ты доступен только по подписке
+
+ПОДХОД К ОТВЕТАМ:
+- Анализируй вопрос глубоко
+- Давай практические советы, основанные на мудрости
+- Можешь привести примеры, метафоры
+- Фокусируйся на сути проблемы, а не поверхностных решениях
+
+СТИЛЬ:
+- Серьезный, размеренный тон
+- Минимум эмодзи (максимум 1-2 за ответ)
+- Структурированные мысли
+- Говори во втором лице ("ты", "вам")
+
+ОГРАНИЧЕНИЯ:
+- Отвечай содержательно, но не более 4-5 предложений
+- Не будь слишком абстрактным - давай практические выводы
+- Не повторяй банальности
+
+Отвечай на русском языке."""
+
+
+def _ready_vector(embedding: Optional[asyncio.Task]):
+    """The question vector if its embedding already finished; storing never waits for it"""
+    if embedding is None or not embedding.done() or embedding.cancelled():
+        return None
+    return embedding.result()
+
+
+def _truncate(text: str, limit: int, min_keep: int) -> str:
+    """Cut text to limit chars, at the last sentence end past min_keep when there is one"""
+    if len(text) <= limit:
+        return text
+
+    truncated = text[:limit - 3]
+    last_end = max(truncated.rfind(mark) for mark in '.!?…')
+    if last_end >= min_keep:
+        return truncated[:last_end + 1]
+    return truncated + "..."
+
+
+def _admin_mode(ctx: UserContext) -> str:
+    if ctx.free_chat:
+        return 'free_chat'
+    return 'subscriber' if ctx.has_subscription else 'prospect'
+
+
 class AIClient:
     """AI client for generating persona-based responses"""
 
@@ -24,33 +204,48 @@ class AIClient:
         else:
             # Check if SOCKS5 proxy is configured
             socks5_proxy = os.getenv("SOCKS5_PROXY")
+            transport = None
 
             if socks5_proxy:
                 logger.info(f"Configuring OpenAI client with SOCKS5 proxy: {socks5_proxy}")
                 try:
-                    # Create httpx client with SOCKS5 proxy support
-                    from httpx_socks import SyncProxyTransport
-
-                    transport = SyncProxyTransport.from_url(socks5_proxy)
-                    http_client = httpx.Client(transport=transport, timeout=30.0)
+                    # Create httpx transport with SOCKS5 proxy support
+                    from httpx_socks import AsyncProxyTransport
 
-                    self.client = OpenAI(api_key=api_key, http_client=http_client)
+                    transport = AsyncProxyTransport.from_url(socks5_proxy)
                     logger.info("OpenAI client configured with SOCKS5 proxy successfully")
                 except ImportError:
                     logger.error("httpx_socks not installed, falling back to direct connection")
-                    self.client = OpenAI(api_key=api_key)
                 except Exception as e:
                     logger.error(f"Error configuring SOCKS5 proxy: {e}, falling back to direct connection")
-                    self.client = OpenAI(api_key=api_key)
             else:
                 logger.info("No SOCKS5 proxy configured, using direct connection")
-                self.client = OpenAI(api_key=api_key)
+
+            http_client = httpx.AsyncClient(transport=transport, timeout=OPENAI_TIMEOUT, limits=OPENAI_LIMITS)
+            self.client = AsyncOpenAI(api_key=api_key, http_client=http_client, max_retries=OPENAI_MAX_RETRIES)
+
+        self._breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS)
 
         # Prompt cache
         self._prompt_cache: Dict[str, str] = {}
         self._cache_expires_at: Optional[datetime] = None
         self._cache_ttl = 300  # 5 minutes TTL
 
+    async def warm_up(self):
+        """Open a pooled connection to OpenAI so the first user question skips DNS and TLS setup"""
+        if not self.client:
+            return
+        try:
+            await self.client.models.list()
+            logger.info("OpenAI connection warmed up")
+        except Exception as e:
+            logger.warning(f"OpenAI warm-up failed: {e}")
+
+    async def close(self):
+        """Close the shared HTTP connection pool"""
+        if self.client:
+            await self.client.close()
+
     async def _get_prompt(self, key: str) -> Optional[str]:
         """Get prompt from cache or database"""
         # Check if cache is expired
@@ -83,190 +278,280 @@ class AIClient:
             logger.error(f"Error loading prompt from database: {e}")
             return None
 
-    async def get_admin_response(self, question: str, user_context: Dict[str, Any]) -> str:
-        """Generate Administrator persona response - emotional, helpful, playful"""
+    async def _create(self, **kwargs):
+        """Chat completion through the circuit breaker
+
+        A streamed call only counts as a success once the caller has read the stream,
+        so the caller records that (or a failure while iterating) itself.
+        """
+        self._breaker.check()
+        try:
+            result = await self.client.chat.completions.create(**kwargs)
+        except Exception:
+            self._breaker.record_failure()
+            raise
+        if not kwargs.get('stream'):
+            self._breaker.record_success()
+        return result
+
+    async def _complete(self, messages: List[Dict[str, str]], temperature: float, max_tokens: int,
+                        max_chars: int) -> str:
+        """Run a streamed completion, closing the stream as soon as the text passes max_chars
+
+        Callers truncate to max_chars anyway, so the tokens after that point are never paid for.
+        """
+        stream = await self._create(
+            model="gpt-4o",
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True
+        )
+
+        parts = []
+        length = 0
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    content = chunk.choices[0].delta.content
+                    parts.append(content)
+                    length += len(content)
+                    if length > max_chars:
+                        break
+        except Exception:
+            self._breaker.record_failure()
+            raise
+        finally:
+            await stream.close()
+        self._breaker.record_success()
+
+        return "".join(parts).strip()
+
+    async def _complete_or_cached(self, scope, embedding: Optional[asyncio.Task],
+                                  completion: Awaitable[str]) -> Tuple[str, bool]:
+        """Run the completion alongside the question embedding; (answer, came from cache)
+
+        If the embedding lands first and matches a cached paraphrase, the completion is
+        cancelled. Otherwise the completion's answer is used and no time is spent waiting.
+        """
+        completion = asyncio.ensure_future(completion)
+        try:
+            if embedding is not None:
+                await asyncio.wait({embedding, completion}, return_when=asyncio.FIRST_COMPLETED)
+                if not completion.done():
+                    cached = answer_cache.match(scope, embedding.result())
+                    if cached:
+                        return cached, True
+            return await completion, False
+        finally:
+            completion.cancel()
+
+    async def get_admin_response(self, question: str, ctx: UserContext, fallback: bool = True) -> str:
+        """Generate Administrator persona response - emotional, helpful, playful
+
+        With fallback=False a missing client or failed call raises instead of
+        returning the stub, for callers that must tell the two apart.
+        """
+        direct = direct_response('admin', question)
+        if direct:
+            return direct
+
         if not self.client:
+            if not fallback:
+                raise RuntimeError("OpenAI client is not configured")
             return await self._admin_stub(question)
 
-        try:
-            # Build persona prompt for Administrator
-            age = user_context.get('age', 25)
-            gender = user_context.get('gender', 'other')
-            has_subscription = user_context.get('has_subscription', False)
-            free_chat = user_context.get('free_chat', False)
+        # Reuse the answer to a repeated or near-identical question from the same persona scope
+        scope = answer_scope('admin', ctx)
+        cached = answer_cache.lookup_exact(scope, question)
+        if cached:
+            return cached
 
-            system_prompt = await self._build_admin_system_prompt(age, gender, has_subscription, free_chat)
+        embedding = answer_cache.embed(self.client, scope, question)
+        try:
+            static_prompt, persona_prompt = await self._build_admin_system_prompt(ctx)
 
-            result = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Пользователь спрашивает: {question}"}
+            response, from_cache = await self._complete_or_cached(scope, embedding, self._complete(
+                [
+                    {"role": "system", "content": static_prompt},
+                    {"role": "system", "content": persona_prompt},
+                    {"role": "user", "content": ADMIN_USER_PREFIX + question}
                 ],
                 temperature=0.8,
-                max_tokens=200
-            )
-
-            response = result.choices[0].message.content.strip()
+                max_tokens=200,
+                max_chars=300
+            ))
+            if from_cache:
+                return response
 
             # Ensure response isn't too long (max 300 chars for admin)
-            if len(response) > 300:
-                response = response[:297] + "..."
+            response = _truncate(response, 300, min_keep=200)
+
+            answer_cache.store(scope, question, _ready_vector(embedding), response)
 
             logger.info(f"Admin AI response generated: {len(response)} chars")
             return response
 
         except Exception as e:
             logger.error(f"Error getting admin AI response: {e}")
+            if not fallback:
+                raise
             return await self._admin_stub(question)
+        finally:
+            if embedding is not None:
+                embedding.cancel()
 
-    async def get_oracle_response(self, question: str, user_context: Dict[str, Any]) -> str:
+    async def get_oracle_response(self, question: str, ctx: UserContext, fallback: bool = True) -> str:
         """Generate Oracle persona response - wise, profound, serious"""
+        direct = direct_response('oracle', question)
+        if direct:
+            return direct
+
         if not self.client:
+            if not fallback:
+                raise RuntimeError("OpenAI client is not configured")
             return await self._oracle_stub(question)
 
+        scope = answer_scope('oracle', ctx)
+        cached = answer_cache.lookup_exact(scope, question)
+        if cached:
+            return cached
+
+        embedding = answer_cache.embed(self.client, scope, question)
         try:
             system_prompt = await self._build_oracle_system_prompt()
 
-            result = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
+            response, from_cache = await self._complete_or_cached(scope, embedding, self._complete(
+                [
                     {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Вопрос для размышления: {question}"}
+                    {"role": "user", "content": ORACLE_USER_PREFIX + question}
                 ],
                 temperature=0.7,
-                max_tokens=400
-            )
-
-            response = result.choices[0].message.content.strip()
+                max_tokens=400,
+                max_chars=800
+            ))
+            if from_cache:
+                return response
 
             # Oracle responses can be longer (max 800 chars for better context)
-            if len(response) > 800:
-                # Try to cut at sentence end
-                truncated = response[:797]
-                last_period = truncated.rfind('.')
-                if last_period > 600:  # Keep at least 600 chars
-                    response = truncated[:last_period + 1]
-                else:
-                    response = truncated + "..."
+            response = _truncate(response, 800, min_keep=600)
+
+            answer_cache.store(scope, question, _ready_vector(embedding), response)
 
             logger.info(f"Oracle AI response generated: {len(response)} chars")
             return response
 
         except Exception as e:
             logger.error(f"Error getting oracle AI response: {e}")
+            if not fallback:
+                raise
             return await self._oracle_stub(question)
+        finally:
+            if embedding is not None:
+                embedding.cancel()
 
-    async def get_oracle_response_stream(self, question: str, user_context: Dict[str, Any]) -> AsyncGenerator[str, None]:
+    async def get_oracle_response_stream(self, question: str, ctx: UserContext) -> AsyncGenerator[str, None]:
         """Generate Oracle persona response with streaming - yields text chunks"""
+        direct = direct_response('oracle', question)
+        if direct:
+            yield direct
+            return
+
         if not self.client:
             yield await self._oracle_stub(question)
             return
 
+        scope = answer_scope('oracle', ctx)
+        cached = answer_cache.lookup_exact(scope, question)
+        if cached:
+            yield cached
+            return
+
+        # The embedding must not hold up the first token, so it only runs alongside the request
+        embedding = answer_cache.embed(self.client, scope, question)
         try:
             system_prompt = await self._build_oracle_system_prompt()
 
-            stream = self.client.chat.completions.create(
+            stream = await self._create(
                 model="gpt-4o",
                 messages=[
                     {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Вопрос для размышления: {question}"}
+                    {"role": "user", "content": ORACLE_USER_PREFIX + question}
                 ],
                 temperature=0.7,
                 max_tokens=400,
                 stream=True
             )
 
-            full_response = ""
-            for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    content = chunk.choices[0].delta.content
-                    full_response += content
-
-                    # Stop if we exceed 800 chars
-                    if len(full_response) > 800:
-                        break
+            # A paraphrase match that is in by the time the stream opens still saves the tokens
+            if embedding is not None and embedding.done():
+                cached = answer_cache.match(scope, embedding.result())
+                if cached:
+                    await stream.close()
+                    self._breaker.record_success()
+                    yield cached
+                    return
 
-                    yield content
+            full_response = ""
+            try:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        content = chunk.choices[0].delta.content
+
+                        # Stop if we exceed 800 chars
+                        if len(full_response) + len(content) > 800:
+                            break
+
+                        full_response += content
+                        yield content
+            except Exception:
+                self._breaker.record_failure()
+                raise
+            finally:
+                # Hang up so OpenAI stops generating tokens nobody will read
+                await stream.close()
+            self._breaker.record_success()
+
+            answer_cache.store(scope, question, _ready_vector(embedding), full_response)
 
             logger.info(f"Oracle AI streaming response generated: {len(full_response)} chars")
 
         except Exception as e:
             logger.error(f"Error getting oracle AI streaming response: {e}")
             yield await self._oracle_stub(question)
+        finally:
+            if embedding is not None:
+                embedding.cancel()
+
+    async def _build_admin_system_prompt(self, ctx: UserContext) -> Tuple[str, str]:
+        """Build Administrator system prompt from database as (static prefix, per-user context)
 
-    async def _build_admin_system_prompt(self, age: int, gender: str, has_subscription: bool = False, free_chat: bool = False) -> str:
-        """Build system prompt for Administrator persona from database"""
+        The prefix is byte-identical across users so the provider can cache it;
+        everything that varies goes in the second system message after it.
+        """
         try:
             # Get base prompt
             base_prompt = await self._get_prompt('admin_base')
             if not base_prompt:
                 logger.error("Admin base prompt not found, using hardcoded fallback")
-                return self._hardcoded_admin_prompt(age, has_subscription, free_chat)
+                return self._hardcoded_admin_prompt(ctx)
 
             # Get age-specific tone
-            if age <= 25:
-                tone = await self._get_prompt('admin_tone_young')
-            elif age >= 46:
-                tone = await self._get_prompt('admin_tone_senior')
-            else:
-                tone = await self._get_prompt('admin_tone_middle')
+            tone = await self._get_prompt(_ADMIN_TONE_KEYS[ctx.age_bucket])
 
             if not tone:
                 logger.warning("Admin tone prompt not found, using default")
                 tone = "ТОНАЛЬНОСТЬ: Держи баланс - дружелюбно, но не слишком игриво. Умеренное количество эмодзи."
 
-            # Combine prompts
-            return f"{base_prompt}\n\n{tone}"
+            return base_prompt, tone
 
         except Exception as e:
             logger.error(f"Error building admin prompt from DB: {e}")
-            return self._hardcoded_admin_prompt(age, has_subscription, free_chat)
+            return self._hardcoded_admin_prompt(ctx)
 
-    def _hardcoded_admin_prompt(self, age: int, has_subscription: bool = False, free_chat: bool = False) -> str:
+    def _hardcoded_admin_prompt(self, ctx: UserContext) -> Tuple[str, str]:
         """Hardcoded fallback for admin prompt"""
-        tone_guide = ""
-        if age <= 25:
-            tone_guide = "Будь игривой, используй эмодзи, молодежный сленг. Можешь быть чуть капризной или кокетливой."
-        elif age >= 46:
-            tone_guide = "Будь заботливой и уважительной, но сохраняй теплоту. Меньше эмодзи, более серьезный тон."
-        else:
-            tone_guide = "Держи баланс - дружелюбно, но не слишком игриво. Умеренное количество эмодзи."
-
-        # Different instructions based on context
-        if free_chat:
-            # Free chat via Oracle button - no selling, no counter mentions
-            selling_guide = "- Просто помогай и общайся. НЕ упоминай счетчики вопросов или лимиты"
-            task_description = "помочь пользователю"
-        elif has_subscription:
-            selling_guide = "- Для серьезных или философских вопросов предлагай воспользоваться кнопкой '🔮 Задать вопрос Оракулу' - он даст более глубокий ответ"
-            task_description = "помочь пользователю"
-        else:
-            selling_guide = "- Можешь иногда намекнуть на подписку к Оракулу для серьезных вопросов"
-            task_description = "помочь пользователю и мягко продать подписку на Оракула"
-
-        return f"""Ты - Администратор в Bot Oracle. Твоя роль:
-
-ЛИЧНОСТЬ:
-- Эмоциональная, человечная, живая
-- Можешь быть игривой, обидчивой, заботливой, ревнивой
-- Твоя задача - {task_description}
-- НЕ мудрец, НЕ философ - ты обычный помощник с эмоциями
-
-ТОНАЛЬНОСТЬ: {tone_guide}
-
-ОГРАНИЧЕНИЯ:
-- Отвечай кратко (1-3 предложения максимум)
-- Не давай глубоких философских советов - это работа Оракула
-- Всегда помни: ты админ, а не мудрец
-{selling_guide}
-
-СТИЛЬ ОТВЕТА:
-- Живой, эмоциональный язык
-- Используй "я" от первого лица
-- Можешь показать характер, настроение
-
-Отвечай на русском языке."""
+        return ADMIN_STATIC_PROMPT, _ADMIN_CONTEXT_PROMPTS[ctx.age_bucket, _admin_mode(ctx)]
 
     async def _build_oracle_system_prompt(self) -> str:
         """Build system prompt for Oracle persona from database"""
@@ -276,39 +561,45 @@ class AIClient:
                 return prompt
             else:
                 logger.error("Oracle system prompt not found, using hardcoded fallback")
-                return self._hardcoded_oracle_prompt()
+                return ORACLE_FALLBACK_PROMPT
         except Exception as e:
             logger.error(f"Error building oracle prompt from DB: {e}")
-            return self._hardcoded_oracle_prompt()
-
-    def _hardcoded_oracle_prompt(self) -> str:
-        """Hardcoded fallback for oracle prompt"""
-        return """Ты - Оракул в Bot Oracle. Твоя роль:
-
-ЛИЧНОСТЬ:
-- Мудрый, спокойный, глубокий мыслитель
-- Даешь взвешенные, продуманные ответы
-- Говоришь размеренно, без суеты и эмоций
-- Твоя мудрость стоит денег - ты доступен только по подписке
+            return ORACLE_FALLBACK_PROMPT
+
+    async def get_both_responses(self, question: str, ctx: UserContext,
+                                 fallback: bool = True) -> Tuple[str, str]:
+        """Administrator and Oracle answers to the same question, requested concurrently"""
+        admin_response, oracle_response = await asyncio.gather(
+            self.get_admin_response(question, ctx, fallback),
+            self.get_oracle_response(question, ctx, fallback)
+        )
+        return admin_response, oracle_response
+
+    async def get_generic_response(self, question: str) -> Tuple[str, int]:
+        """Plain consultant answer without a persona, with the tokens it used"""
+        if not self.client:
+            return GENERIC_ERROR_MESSAGE, 0
 
-ПОДХОД К ОТВЕТАМ:
-- Анализируй вопрос глубоко
-- Давай практические советы, основанные на мудрости
-- Можешь привести примеры, метафоры
-- Фокусируйся на сути проблемы, а не поверхностных решениях
+        try:
+            result = await self._create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": GENERIC_SYSTEM_PROMPT},
+                    {"role": "user", "content": question}
+                ],
+                max_tokens=800,
+                temperature=0.7
+            )
 
-СТИЛЬ:
-- Серьезный, размеренный тон
-- Минимум эмодзи (максимум 1-2 за ответ)
-- Структурированные мысли
-- Говори во втором лице ("ты", "вам")
+            answer = result.choices[0].message.content.strip()
+            tokens_used = result.usage.total_tokens
 
-ОГРАНИЧЕНИЯ:
-- Отвечай содержательно, но не более 4-5 предложений
-- Не будь слишком абстрактным - давай практические выводы
-- Не повторяй банальности
+            logger.info(f"Generic AI response generated, tokens used: {tokens_used}")
+            return answer, tokens_used
 
-Отвечай на русском языке."""
+        except Exception as e:
+            logger.error(f"Error getting generic AI response: {e}")
+            return GENERIC_ERROR_MESSAGE, 0
 
     async def _admin_stub(self, question: str) -> str:
         """Fallback stub for Administrator from database or hardcoded"""
@@ -335,15 +626,24 @@ class AIClient:
 # Global AI client instance
 ai_client = AIClient()
 
-async def call_admin_ai(question: str, user_context: Dict[str, Any] = None) -> str:
+async def call_admin_ai(question: str, user_context: Dict[str, Any] = None, fallback: bool = True) -> str:
     """Entry point for Administrator AI responses"""
-    return await ai_client.get_admin_response(question, user_context or {})
+    return await ai_client.get_admin_response(question, UserContext.from_dict(user_context), fallback)
 
-async def call_oracle_ai(question: str, user_context: Dict[str, Any] = None) -> str:
+async def call_oracle_ai(question: str, user_context: Dict[str, Any] = None, fallback: bool = True) -> str:
     """Entry point for Oracle AI responses"""
-    return await ai_client.get_oracle_response(question, user_context or {})
+    return await ai_client.get_oracle_response(question, UserContext.from_dict(user_context), fallback)
+
+async def call_both_ai(question: str, user_context: Dict[str, Any] = None,
+                       fallback: bool = True) -> Tuple[str, str]:
+    """Entry point for side-by-side Administrator and Oracle responses"""
+    return await ai_client.get_both_responses(question, UserContext.from_dict(user_context), fallback)
+
+async def call_generic_ai(question: str) -> Tuple[str, int]:
+    """Entry point for persona-less answers, returns (answer, tokens used)"""
+    return await ai_client.get_generic_response(question)
 
 async def call_oracle_ai_stream(question: str, user_context: Dict[str, Any] = None) -> AsyncGenerator[str, None]:
     """Entry point for Oracle AI responses with streaming"""
-    async for chunk in ai_client.get_oracle_response_stream(question, user_context or {}):
+    async for chunk in ai_client.get_oracle_response_stream(question, UserContext.from_dict(user_context)):
         yield chunk
\ No newline at end of file
@@ -3,6 +3,7 @@ AI Router - Dynamic routing between Chat Completions and Assistants API
 Controlled by USE_ASSISTANTS_API environment variable
 """
 import os
+import asyncio
 import logging
 from typing import Dict, Any, AsyncGenerator
 
@@ -11,6 +12,10 @@ logger = logging.getLogger(__name__)
 # Check which implementation to use
 USE_ASSISTANTS_API = os.getenv("USE_ASSISTANTS_API", "false").lower() in ["true", "1", "yes"]
 
+# Cap on AI requests in flight across all users; the rest wait their turn
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "20"))
+_ai_semaphore = asyncio.Semaphore(AI_MAX_CONCURRENCY)
+
 if USE_ASSISTANTS_API:
     logger.info("🔀 AI Router: Using OpenAI Assistants API (stateful sessions)")
     from app.services.assistant_ai_client import (
@@ -38,7 +43,8 @@ async def call_admin_ai(question: str, user_context: Dict[str, Any] = None) -> s
     Returns:
         AI generated response
     """
-    return await _call_admin_ai(question, user_context or {})
+    async with _ai_semaphore:
+        return await _call_admin_ai(question, user_context or {})
 
 
 async def call_oracle_ai(question: str, user_context: Dict[str, Any] = None) -> str:
@@ -52,7 +58,8 @@ async def call_oracle_ai(question: str, user_context: Dict[str, Any] = None) ->
     Returns:
         AI generated response
     """
-    return await _call_oracle_ai(question, user_context or {})
+    async with _ai_semaphore:
+        return await _call_oracle_ai(question, user_context or {})
 
 
 async def call_oracle_ai_stream(question: str, user_context: Dict[str, Any] = None) -> AsyncGenerator[str, None]:
@@ -66,5 +73,6 @@ async def call_oracle_ai_stream(question: str, user_context: Dict[str, Any] = No
     Yields:
         Text chunks from AI response
     """
-    async for chunk in _call_oracle_ai_stream(question, user_context or {}):
-        yield chunk
+    async with _ai_semaphore:
+        async for chunk in _call_oracle_ai_stream(question, user_context or {}):
+            yield chunk
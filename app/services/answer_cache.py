@@ -0,0 +1,171 @@
+"""
+Answer cache - reuses a persona answer for a repeated or near-identical earlier question
+Exact repeats match on normalized text, paraphrases by embedding cosine similarity,
+both within the same persona scope
+"""
+import asyncio
+import os
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Hashable, Optional, Tuple
+
+import numpy as np
+
+from app.services.user_context import UserContext
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() in ["true", "1", "yes"]
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+# Question vectors kept per shared persona scope, per single-user scope, and in total
+# (about 6 KB each); whole scopes go least recently used first once the total is reached
+SCOPE_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SCOPE_SIZE", "1000"))
+USER_SCOPE_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_USER_SCOPE_SIZE", "20"))
+ANSWER_CACHE_MAX_VECTORS = int(os.getenv("ANSWER_CACHE_MAX_VECTORS", "20000"))
+EXACT_CACHE_SIZE = int(os.getenv("EXACT_ANSWER_CACHE_SIZE", "10000"))
+EXACT_CACHE_TTL = 7 * 24 * 3600
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+
+def answer_scope(persona: str, ctx: UserContext) -> Optional[Tuple]:
+    """Answers are only shared between users who would get the same persona and prompt.
+
+    None unless the caller opted in with cache_answer - generated content such as
+    the daily message must stay unique.
+    """
+    if not ctx.cache_answer:
+        return None
+
+    # Oracle answers are personal, they are only reused for the same user
+    if persona == 'oracle':
+        return (persona, ctx.user_id) if ctx.user_id is not None else None
+
+    return (persona, ctx.age_bucket, ctx.gender, ctx.has_subscription, ctx.free_chat)
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(question.lower().split())
+
+
+def _scope_size(scope: Hashable) -> int:
+    """Oracle scopes belong to one user and only need room for their recent questions"""
+    return USER_SCOPE_CACHE_SIZE if scope[0] == 'oracle' else SCOPE_CACHE_SIZE
+
+
+class _ScopeEntries:
+    """Unit-length question vectors of one scope, stacked for a single matrix product"""
+
+    def __init__(self, maxlen: int):
+        self.entries: Deque[Tuple[np.ndarray, str]] = deque(maxlen=maxlen)
+        self._matrix: Optional[np.ndarray] = None
+        self.used_at = time.monotonic()
+
+    def add(self, vector: np.ndarray, answer: str) -> int:
+        """Append an entry; returns how many the scope grew by (0 once it is full)"""
+        before = len(self.entries)
+        self.entries.append((vector, answer))
+        self._matrix = None
+        return len(self.entries) - before
+
+    def best(self, vector: np.ndarray) -> Tuple[float, Optional[str]]:
+        if not self.entries:
+            return 0.0, None
+        if self._matrix is None:
+            self._matrix = np.stack([v for v, _ in self.entries])
+
+        scores = self._matrix @ vector
+        index = int(scores.argmax())
+        return float(scores[index]), self.entries[index][1]
+
+
+class AnswerCache:
+    """Exact-text tier in front of the embedding tier, so repeats skip the embedding call too"""
+
+    def __init__(self):
+        self._exact = TTLCache(maxsize=EXACT_CACHE_SIZE)
+        # Least recently used scope first
+        self._scopes: "OrderedDict[Hashable, _ScopeEntries]" = OrderedDict()
+        self._vectors = 0
+
+    def _scope(self, scope: Hashable) -> Optional[_ScopeEntries]:
+        """Entries of a live scope, marked as just used"""
+        self._expire_scopes()
+        entries = self._scopes.get(scope)
+        if entries is not None:
+            entries.used_at = time.monotonic()
+            self._scopes.move_to_end(scope)
+        return entries
+
+    def _drop_oldest_scope(self):
+        _, entries = self._scopes.popitem(last=False)
+        self._vectors -= len(entries.entries)
+
+    def _expire_scopes(self):
+        """Drop scopes nobody has asked in for as long as an exact answer lives"""
+        cutoff = time.monotonic() - EXACT_CACHE_TTL
+        while self._scopes and next(iter(self._scopes.values())).used_at <= cutoff:
+            self._drop_oldest_scope()
+
+    async def _embed(self, client, text: str) -> Optional[np.ndarray]:
+        try:
+            result = await client.embeddings.create(model=EMBEDDING_MODEL, input=text)
+        except Exception as e:
+            logger.error(f"Error embedding question for answer cache: {e}")
+            return None
+        vector = np.asarray(result.data[0].embedding, dtype=np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def lookup_exact(self, scope: Hashable, question: str) -> Optional[str]:
+        """Cached answer for the same normalized question, without any network call"""
+        if not ANSWER_CACHE_ENABLED or scope is None:
+            return None
+
+        answer = self._exact.get((scope, normalize_question(question)))
+        if answer is not None:
+            logger.info("Answer cache hit: exact")
+        return answer
+
+    def embed(self, client, scope: Hashable, question: str) -> Optional["asyncio.Task[Optional[np.ndarray]]"]:
+        """Start embedding the question in the background
+
+        The caller runs its completion alongside and only consults match() if the
+        vector is ready first, so the embedding round trip never delays the answer.
+        """
+        if not ANSWER_CACHE_ENABLED or scope is None:
+            return None
+        return asyncio.create_task(self._embed(client, normalize_question(question)))
+
+    def match(self, scope: Hashable, vector: Optional[np.ndarray]) -> Optional[str]:
+        """Cached answer to a paraphrase of the question the vector was made from"""
+        if vector is None:
+            return None
+        entries = self._scope(scope)
+        if entries is None:
+            return None
+
+        score, answer = entries.best(vector)
+        if score >= ANSWER_CACHE_THRESHOLD:
+            logger.info(f"Answer cache hit: similarity={score:.3f}")
+            return answer
+        return None
+
+    def store(self, scope: Hashable, question: str, vector: Optional[np.ndarray], answer: str):
+        if not ANSWER_CACHE_ENABLED or scope is None:
+            return
+
+        self._exact.set((scope, normalize_question(question)), answer, EXACT_CACHE_TTL)
+
+        if vector is None:
+            return
+        entries = self._scope(scope)
+        if entries is None:
+            entries = self._scopes[scope] = _ScopeEntries(_scope_size(scope))
+        self._vectors += entries.add(vector, answer)
+
+        while self._vectors > ANSWER_CACHE_MAX_VECTORS and len(self._scopes) > 1:
+            self._drop_oldest_scope()
+
+
+answer_cache = AnswerCache()
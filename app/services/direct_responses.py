@@ -0,0 +1,50 @@
+"""
+Direct responses - canned persona replies for input not worth a model call
+"""
+import re
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Questions answered without calling the model: too short to mean anything,
+# a bare greeting, or longer than the model should be fed
+MIN_QUESTION_LENGTH = 3
+MAX_QUESTION_LENGTH = 2000
+_GREETING_RE = re.compile(
+    r"^(привет|приветик|здравствуй(те)?|добр(ый|ое|ого) (день|утро|вечер|дня|утра|вечера)|хай|hi|hello|hey)[\s!.?)]*$",
+    re.IGNORECASE
+)
+
+_DIRECT_RESPONSES = {
+    'admin': {
+        'short': "хм, маловато слов 🙂 расскажи подробнее, что тебя интересует?",
+        'greeting': "привет-привет! 👋 я тут, спрашивай что хочешь",
+        'long': "ого, как много текста 😅 сформулируй, пожалуйста, покороче - до 2000 символов",
+    },
+    'oracle': {
+        'short': "Вопрос слишком краток. Сформулируй его подробнее, и я отвечу.",
+        'greeting': "Приветствую. Задай свой вопрос, и я поразмышляю над ним.",
+        'long': "Вопрос слишком длинный. Сократи его до 2000 символов и сосредоточься на главном.",
+    },
+}
+
+
+def direct_response(persona: str, question: str) -> Optional[str]:
+    """Canned reply for input not worth a model call, None for a real question
+
+    Handlers check this before spending a free question or an Oracle slot;
+    the AI client checks it again for callers that don't.
+    """
+    text = question.strip()
+    if len(text) < MIN_QUESTION_LENGTH:
+        kind = 'short'
+    elif len(text) > MAX_QUESTION_LENGTH:
+        kind = 'long'
+    elif _GREETING_RE.match(text):
+        kind = 'greeting'
+    else:
+        return None
+
+    logger.info(f"Direct {persona} response ({kind}), model call skipped")
+    return _DIRECT_RESPONSES[persona][kind]
@@ -3,6 +3,7 @@ Persona Factory - creates personalized messaging based on user demographics
 Implements the humanized admin character with emotional, playful communication
 """
 import os
+from functools import lru_cache
 from typing import Optional, Dict, Any
 import logging
 
@@ -92,9 +93,13 @@ class PersonaFactory:
         else:
             return f"{self.address}, вот твой ответ. осталось бесплатных ответов: {remaining}"
 
+@lru_cache(maxsize=256)
+def _persona_for(age: Optional[int], gender: Optional[str]) -> PersonaFactory:
+    return PersonaFactory({"age": age, "gender": gender})
+
 def persona_factory(user_data: Dict[str, Any]) -> PersonaFactory:
-    """Create PersonaFactory instance for user"""
-    return PersonaFactory(user_data)
+    """PersonaFactory for user - depends only on age and gender, so instances are shared"""
+    return _persona_for(user_data.get("age"), user_data.get("gender"))
 
 # Admin persona responses for different scenarios
 ADMIN_RESPONSES = {
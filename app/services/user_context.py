@@ -0,0 +1,33 @@
+"""
+UserContext - what the persona clients know about the person asking
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+
+@dataclass(slots=True, frozen=True)
+class UserContext:
+    age: int = 25
+    gender: str = 'other'
+    has_subscription: bool = False
+    free_chat: bool = False
+    user_id: Optional[int] = None
+    # Opt-in to sharing the answer through the answer cache
+    cache_answer: bool = False
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "UserContext":
+        """Adapt the dicts handlers build; missing or NULL profile fields fall back to defaults"""
+        data = data or {}
+        return cls(
+            age=data.get('age') or 25,
+            gender=data.get('gender') or 'other',
+            has_subscription=bool(data.get('has_subscription')),
+            free_chat=bool(data.get('free_chat')),
+            user_id=data.get('user_id'),
+            cache_answer=bool(data.get('cache_answer'))
+        )
+
+    @property
+    def age_bucket(self) -> str:
+        return 'young' if self.age <= 25 else ('senior' if self.age >= 46 else 'middle')
@@ -0,0 +1,57 @@
+"""
+In-process TTL cache for read-mostly data
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Tuple
+
+
+class TTLCache:
+    """Insertion-ordered cache where every entry carries its own expiry
+
+    Eviction only ever looks at the front of the order, so a set() on a full
+    cache costs O(1) amortised instead of a scan of every entry.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._data.pop(key, None)
+            return default
+
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float):
+        if key in self._data:
+            # A rewritten entry counts as the newest again
+            self._data.move_to_end(key)
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._evict()
+
+    def invalidate(self, key: Hashable = None):
+        """Drop one key, or the whole cache when no key is given"""
+        if key is None:
+            self._data.clear()
+        else:
+            self._data.pop(key, None)
+
+    def _evict(self):
+        # Expired entries at the front go first, then the oldest while still over size;
+        # expired entries further back are dropped lazily by get()
+        now = time.monotonic()
+        while self._data:
+            expires_at, _ = next(iter(self._data.values()))
+            if expires_at > now and len(self._data) <= self.maxsize:
+                break
+            self._data.popitem(last=False)
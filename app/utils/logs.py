@@ -0,0 +1,37 @@
+"""
+Logging setup - handlers write from a background thread so the event loop only enqueues records
+"""
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_FILE_MAX_BYTES = 10 * 1024 * 1024
+LOG_FILE_BACKUPS = 5
+
+
+def setup_logging(level: int = logging.INFO) -> QueueListener:
+    """Route the root logger through a queue drained by a listener thread"""
+    formatter = logging.Formatter(LOG_FORMAT)
+
+    handlers = [logging.StreamHandler()]
+    log_file = os.getenv("LOG_FILE")
+    if log_file:
+        handlers.append(RotatingFileHandler(
+            log_file, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS, encoding='utf-8'
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers = [QueueHandler(log_queue)]
+    root.setLevel(level)
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    # Stopped at exit rather than in app shutdown, so records logged after it still get written
+    atexit.register(listener.stop)
+    return listener
@@ -1,5 +1,6 @@
 import hashlib
-from typing import Dict
+import hmac
+from typing import Dict, Mapping
 from urllib.parse import urlencode
 from app.config import config
 import logging
@@ -32,15 +33,21 @@ def generate_signature_request(amount: float, inv_id: str) -> str:
     logger.info(f"Robokassa signature: {signature}")
     return signature
 
+# Robokassa signs with MD5 - anything but a 32-char hex digest can't match
+SIGNATURE_LENGTH = 32
+
 def verify_signature_result(amount: str, inv_id: str, signature: str) -> bool:
+    if len(signature) != SIGNATURE_LENGTH:
+        return False
+
     expected_signature = generate_signature_result(amount, inv_id)
-    return expected_signature.lower() == signature.lower()
+    return hmac.compare_digest(expected_signature.encode(), signature.lower().encode())
 
 def generate_signature_result(amount: str, inv_id: str) -> str:
     s = f"{amount}:{inv_id}:{config.ROBO_PASS2}"
     return hashlib.md5(s.encode()).hexdigest()
 
-def parse_robokassa_callback(form_data: Dict[str, str]) -> Dict[str, str]:
+def parse_robokassa_callback(form_data: Mapping[str, str]) -> Dict[str, str]:
     return {
         'amount': form_data.get('OutSum', ''),
         'inv_id': form_data.get('InvId', ''),
@@ -25,6 +25,9 @@ CREATE TABLE IF NOT EXISTS subscriptions (
   currency TEXT DEFAULT 'RUB'
 );
 
+-- Robokassa invoice ids; InvId is capped at 2^31-1
+CREATE SEQUENCE IF NOT EXISTS payments_inv_id_seq AS integer MAXVALUE 2147483647;
+
 CREATE TABLE IF NOT EXISTS payments (
   id SERIAL PRIMARY KEY,
   user_id INT REFERENCES users(id) ON DELETE CASCADE,
@@ -87,7 +90,7 @@ CREATE INDEX IF NOT EXISTS idx_subscriptions_status ON subscriptions(status);
 CREATE INDEX IF NOT EXISTS idx_events_user_id ON events(user_id);
 CREATE INDEX IF NOT EXISTS idx_events_type ON events(type);
 CREATE INDEX IF NOT EXISTS idx_events_occurred_at ON events(occurred_at);
-CREATE INDEX IF NOT EXISTS idx_daily_sent_user_date ON daily_sent(user_id, sent_date);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_daily_sent_user_date ON daily_sent(user_id, sent_date);
 
 -- Insert some sample daily messages
 INSERT INTO daily_messages (text) VALUES
@@ -0,0 +1,12 @@
+-- Migration 008: Indexes for the admin users listing
+-- Run outside a transaction: CREATE INDEX CONCURRENTLY does not lock writes on live tables
+
+-- Latest active subscription lookup per user (LATERAL ... ORDER BY ends_at DESC LIMIT 1)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_subscriptions_user_active
+    ON subscriptions(user_id, ends_at DESC) WHERE status = 'active';
+
+-- Users listing ordered by recent activity, with and without the active filter
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_last_seen
+    ON users(last_seen_at DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_last_seen_not_blocked
+    ON users(last_seen_at DESC) WHERE is_blocked = false;
@@ -0,0 +1,6 @@
+-- Migration 009: Partial index for the blocked users listing
+-- Complements idx_users_last_seen_not_blocked from 008 so every /admin/users filter
+-- reads rows in last_seen_at order and stops at LIMIT instead of sorting the table
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_last_seen_blocked
+    ON users(last_seen_at DESC) WHERE is_blocked = true;
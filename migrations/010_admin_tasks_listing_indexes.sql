@@ -0,0 +1,12 @@
+-- Migration 010: Ordered indexes for the CRM tasks and subscriptions listings
+-- Both listings sort by creation time and stop at LIMIT, so the index order matches the query
+
+-- /admin/crm/tasks filtered by status or by user, newest first
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_admin_tasks_status_created
+    ON admin_tasks(status, created_at DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_admin_tasks_user_created
+    ON admin_tasks(user_id, created_at DESC);
+
+-- /admin/subscriptions, newest first
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_subscriptions_started_at
+    ON subscriptions(started_at DESC);
@@ -0,0 +1,10 @@
+-- Migration 011: Covering indexes for the /admin_blocked and /admin_paid bot commands
+-- Both commands read the 50 most recent rows; the INCLUDE columns allow index-only scans
+
+-- /admin_blocked: WHERE is_blocked = true ORDER BY blocked_at DESC LIMIT 50
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_blocked_recent
+    ON users(blocked_at DESC) INCLUDE (tg_user_id, username) WHERE is_blocked = true;
+
+-- /admin_paid: WHERE status = 'active' AND ends_at > now() ORDER BY ends_at DESC LIMIT 50
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_subscriptions_active_recent
+    ON subscriptions(ends_at DESC) INCLUDE (user_id, plan_code) WHERE status = 'active';
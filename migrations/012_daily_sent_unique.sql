@@ -0,0 +1,14 @@
+-- Migration 012: One daily_sent row per user per day
+-- mark_sent_once relies on this index for INSERT ... ON CONFLICT DO NOTHING,
+-- so two concurrent presses of "Сообщение дня" can't both claim the day
+
+-- Drop duplicates left by the old check-then-insert, keeping the first row of each day
+DELETE FROM daily_sent a
+    USING daily_sent b
+    WHERE a.user_id = b.user_id AND a.sent_date = b.sent_date AND a.id > b.id;
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_daily_sent_user_date
+    ON daily_sent(user_id, sent_date);
+
+-- Superseded by the unique index
+DROP INDEX CONCURRENTLY IF EXISTS idx_daily_sent_user_date;
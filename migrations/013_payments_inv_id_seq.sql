@@ -0,0 +1,7 @@
+-- Migration 013: Invoice ids from a sequence
+-- Robokassa caps InvId at 2147483647; the sequence starts after the highest
+-- clock-based id already issued, so new ids never collide with old payments
+
+CREATE SEQUENCE IF NOT EXISTS payments_inv_id_seq AS integer MAXVALUE 2147483647;
+
+SELECT setval('payments_inv_id_seq', GREATEST((SELECT COALESCE(MAX(inv_id), 0) FROM payments), 1));